@@ -0,0 +1,376 @@
+'''
+@author: Saarthik Tannan
+@contact: saarthik@gmail.com
+'''
+# Command line batch parser for exported "User Data" trees, run with CPython:
+#
+#   python Windows_Chrome_Batch.py /mnt/share/exports -o chrome.sqlite
+#   python Windows_Chrome_Batch.py /mnt/share/exports --ndjson - > chrome.ndjson
+#
+# Every registered file of every profile below the given directories is parsed on a
+# process pool with the same readers as the Autopsy module. The rows are written by
+# this process only, in bulk, with one table (or NDJSON "artifact") per artifact type
+# and one column per artifact attribute, so the output matches the ingest artifacts.
+
+# This is free and unencumbered software released into the public domain.
+# See Windows_Chrome_Module.py for the full text of the license.
+
+from __future__ import print_function
+
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+try:
+    import Queue
+except ImportError:
+    import queue as Queue
+
+from Windows_Chrome_Core import USER_DATA_DIR, SplitUserDataPath, SQLITE_SIDECARS
+from Windows_Chrome_Core import EXTRACTORS, ReadTable, OpenJson, ReadJson, ReadCache, RecoveredRecords
+from Windows_Chrome_Core import SqliteSource, AttributeValues
+from Windows_Chrome_Cache import NeedsCacheFile
+from Windows_Chrome_Carver import CarveDatabase
+
+
+# Rows a worker hands to the writer at a time, and chunks that may wait for it
+ROW_CHUNK = 5000
+QUEUE_DEPTH = 16
+
+# Seconds the writer waits for rows before it checks for failed tasks and dead workers
+POLL_INTERVAL = 1.0
+
+# Readers by table, and the attribute columns of every artifact type in reader order
+READERS = {}
+ARTIFACT_COLUMNS = {}
+for _extractor in EXTRACTORS:
+    for _reader in _extractor.readers + _extractor.carvers:
+        READERS[_reader.table] = _reader
+        columns = ARTIFACT_COLUMNS.setdefault(_reader.artifact, [])
+        for _name, _field, _kind in _reader.attributes:
+            if _name not in [column for column, kind in columns]:
+                columns.append((_name, _kind))
+
+# Columns naming where every row comes from
+SOURCE_COLUMNS = ("source", "user", "browser", "profile", "file")
+
+
+# One registered file of one profile, the unit of work of the pool
+class BatchTask(object):
+    __slots__ = ("source", "user", "browser", "profile", "relPath", "path", "extractor")
+
+    def __init__(self, source, user, browser, profile, relPath, path, extractor):
+        self.source = source
+        self.user = user
+        self.browser = browser
+        self.profile = profile
+        self.relPath = relPath
+        self.path = path
+        self.extractor = extractor
+
+    def origin(self):
+        return (self.source, self.user, self.browser, self.profile, self.relPath)
+
+
+def FindTasks(roots):
+    '''A BatchTask for every registered file of every profile of every "User Data" directory below roots'''
+    tasks = []
+    for root in roots:
+        for dirpath, dirnames, filenames in os.walk(root):
+            if os.path.basename(dirpath).lower() != USER_DATA_DIR.lower():
+                dirnames.sort()
+                continue
+            # Profiles are only looked into for the registered files
+            source = os.path.relpath(dirpath, root).replace(os.sep, "/")
+            for name in sorted(dirnames):
+                parts = SplitUserDataPath(os.path.join(dirpath, name).replace(os.sep, "/") + "/")
+                if parts is None:
+                    continue
+                user, browser, profile, sub = parts
+                for index, extractor in enumerate(EXTRACTORS):
+                    for relPath in extractor.paths:
+                        path = os.path.join(dirpath, name, *relPath.split("/"))
+                        if os.path.isfile(path):
+                            tasks.append(BatchTask(source, user, browser, profile, relPath, path, index))
+            dirnames[:] = []
+    return tasks
+
+
+# Type of text values, kept as they are
+_TEXT = type(u"")
+
+
+def ConvertValue(kind, value):
+    '''Attribute value as the module converts it, text for "string" and "optional" and integers otherwise'''
+    if kind == "optional" and not value:
+        # Empty optional attributes are left out of the artifacts, they are NULL here
+        return None
+    if kind not in ("string", "optional"):
+        return int(value or 0)
+    if value.__class__ is _TEXT:
+        return value
+    if value is None:
+        return u""
+    if isinstance(value, bytes) and not isinstance(value, str):
+        return value.decode("utf-8", "replace")
+    return u"%s" % (value,)
+
+
+def RecordRows(reader, records):
+    '''(table, attribute values) of every record of a reader'''
+    for record in records:
+        yield reader.table, tuple([ConvertValue(kind, value) for name, kind, value in AttributeValues(reader, record)])
+
+
+# Set in every worker process by InitWorker. workers is shared memory holding the
+# pid of the worker of every started task, written before the task does anything.
+_queue = None
+_options = None
+_workers = None
+
+
+def InitWorker(queue, options, workers):
+    global _queue, _options, _workers
+    _queue = queue
+    _options = options
+    _workers = workers
+
+
+def ParseTask(index, task):
+    '''Parse one file on a worker, the rows go to the writer in chunks, then ("done", index, stats)'''
+    _workers[index] = os.getpid()
+    stats = {"bytes": 0, "rows": 0, "errors": []}
+    try:
+        chunk = []
+        for row in TaskRows(task, stats):
+            chunk.append(row)
+            if len(chunk) >= ROW_CHUNK:
+                _queue.put(("rows", index, chunk))
+                stats["rows"] += len(chunk)
+                chunk = []
+        if chunk:
+            _queue.put(("rows", index, chunk))
+            stats["rows"] += len(chunk)
+    except Exception as e:
+        stats["errors"].append("%s: %s" % (task.path, e))
+    _queue.put(("done", index, stats))
+
+
+def TaskRows(task, stats):
+    extractor = EXTRACTORS[task.extractor]
+    if extractor.kind == "json":
+        stats["bytes"] += os.path.getsize(task.path)
+        for reader in extractor.readers:
+            stream = OpenJson(task.path)
+            try:
+                for row in RecordRows(reader, ReadJson(stream, reader)):
+                    yield row
+            finally:
+                stream.close()
+        return
+    if extractor.kind == "cache":
+        folder = os.path.dirname(task.path)
+        for name in os.listdir(folder):
+            if NeedsCacheFile(name):
+                stats["bytes"] += os.path.getsize(os.path.join(folder, name))
+        for reader in extractor.readers:
+            for row in RecordRows(reader, ReadCache(folder, reader)):
+                yield row
+        return
+
+    # Databases are copied with their sidecars, the WAL is folded into the copy
+    folder = tempfile.mkdtemp(prefix="chrome-", dir=_options["temp"])
+    try:
+        copy = os.path.join(folder, os.path.basename(task.path))
+        for suffix in ("",) + SQLITE_SIDECARS:
+            if os.path.isfile(task.path + suffix):
+                shutil.copyfile(task.path + suffix, copy + suffix)
+                stats["bytes"] += os.path.getsize(copy + suffix)
+        carved = []
+        if _options["recover"] and extractor.carvers:
+            try:
+                carved = CarveDatabase(copy, [reader.source for reader in extractor.carvers])
+            except Exception as e:
+                stats["errors"].append("%s: recovery: %s" % (task.path, e))
+        source = SqliteSource(copy)
+        try:
+            for reader in extractor.readers:
+                try:
+                    for row in RecordRows(reader, ReadTable(source, reader)):
+                        yield row
+                except sqlite3.Error as e:
+                    stats["errors"].append("%s: %s: %s" % (task.path, reader.table, e))
+            for reader in extractor.carvers:
+                try:
+                    for row in RecordRows(reader, RecoveredRecords(source, reader, carved)):
+                        yield row
+                except sqlite3.Error as e:
+                    stats["errors"].append("%s: %s: %s" % (task.path, reader.table, e))
+        finally:
+            source.close()
+    finally:
+        shutil.rmtree(folder, True)
+
+
+# Writes rows to one SQLite file, a table per artifact type created on first use and
+# one transaction per chunk of rows
+class SqliteWriter(object):
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=MEMORY")
+        self.connection.execute("PRAGMA synchronous=OFF")
+        self.inserts = {}
+
+    def insert(self, artifact):
+        if artifact not in self.inserts:
+            columns = ARTIFACT_COLUMNS[artifact]
+            definitions = ["%s TEXT" % name for name in SOURCE_COLUMNS]
+            definitions += ["%s %s" % (name, "TEXT" if kind in ("string", "optional") else "INTEGER") for name, kind in columns]
+            self.connection.execute("CREATE TABLE IF NOT EXISTS %s (%s)" % (artifact, ", ".join(definitions)))
+            self.inserts[artifact] = "INSERT INTO %s VALUES (%s)" % (artifact,
+                ", ".join(["?"] * (len(SOURCE_COLUMNS) + len(columns))))
+        return self.inserts[artifact]
+
+    def write(self, task, rows):
+        origin = task.origin()
+        batches = {}
+        for table, values in rows:
+            reader = READERS[table]
+            batches.setdefault(reader.artifact, []).append(origin + Widen(reader, values))
+        with self.connection:
+            for artifact, batch in batches.items():
+                self.connection.executemany(self.insert(artifact), batch)
+
+    def close(self):
+        self.connection.close()
+
+
+# Writes rows as newline delimited JSON objects with the artifact type and attributes
+class NdjsonWriter(object):
+    def __init__(self, path):
+        self.stream = sys.stdout if path == "-" else io.open(path, "w", encoding="utf-8")
+
+    def write(self, task, rows):
+        origin = dict(zip(SOURCE_COLUMNS, task.origin()))
+        lines = []
+        for table, values in rows:
+            reader = READERS[table]
+            row = dict(origin)
+            row["artifact"] = reader.artifact
+            for (name, field, kind), value in zip(reader.attributes, values):
+                row[name] = value
+            lines.append(json.dumps(row, ensure_ascii=False, sort_keys=True))
+        lines.append(u"")
+        text = u"\n".join(lines)
+        self.stream.write(text if self.stream is not sys.stdout or sys.version_info[0] > 2 else text.encode("utf-8"))
+
+    def close(self):
+        if self.stream is not sys.stdout:
+            self.stream.close()
+
+
+def Widen(reader, values):
+    '''Attribute values of a reader in the column order of its artifact type, None for the other columns'''
+    byName = dict(zip([name for name, field, kind in reader.attributes], values))
+    return tuple([byName.get(name) for name, kind in ARTIFACT_COLUMNS[reader.artifact]])
+
+
+def LostTasks(results, pending, workers):
+    '''
+    (index, reason) of the pending tasks that will never report done: their AsyncResult
+    failed outside of ParseTask's own error handling, or the worker running them died.
+    The pool replaces a dead worker but never completes its task.
+    '''
+    alive = set([process.pid for process in multiprocessing.active_children()])
+    lost = []
+    for index in sorted(pending):
+        result = results[index]
+        if result.ready() and not result.successful():
+            try:
+                result.get()
+            except Exception as e:
+                lost.append((index, str(e)))
+        elif workers[index] and workers[index] not in alive:
+            lost.append((index, "worker process %d died" % workers[index]))
+    return lost
+
+
+def Run(roots, writer, processes, options, log=sys.stderr):
+    '''Parse every profile below roots on a pool of processes, returns the totals'''
+    started = time.time()
+    tasks = FindTasks(roots)
+    totals = {"profiles": len(set([task.origin()[:4] for task in tasks])), "files": len(tasks),
+        "rows": 0, "bytes": 0, "errors": 0}
+    queue = multiprocessing.Queue(QUEUE_DEPTH)
+    workers = multiprocessing.Array("l", max(1, len(tasks)), lock=False)
+    pool = multiprocessing.Pool(processes, InitWorker, (queue, options, workers))
+    try:
+        results = [pool.apply_async(ParseTask, (index, task)) for index, task in enumerate(tasks)]
+        pool.close()
+        pending = set(range(len(tasks)))
+        lost = False
+        while pending:
+            try:
+                kind, index, payload = queue.get(True, POLL_INTERVAL)
+            except Queue.Empty:
+                for index, reason in LostTasks(results, pending, workers):
+                    pending.discard(index)
+                    lost = True
+                    totals["errors"] += 1
+                    print("error: %s: %s" % (tasks[index].path, reason), file=log)
+                continue
+            if kind == "rows":
+                writer.write(tasks[index], payload)
+                continue
+            pending.discard(index)
+            totals["rows"] += payload["rows"]
+            totals["bytes"] += payload["bytes"]
+            totals["errors"] += len(payload["errors"])
+            for error in payload["errors"]:
+                print("error: " + error, file=log)
+        if lost:
+            # The pool still waits for the lost tasks, join would never return
+            pool.terminate()
+        else:
+            pool.join()
+    except:
+        pool.terminate()
+        raise
+    totals["seconds"] = time.time() - started
+    return totals
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parse exported Chrome \"User Data\" directories in bulk")
+    parser.add_argument("roots", nargs="+", help="directories searched for \"User Data\" directories")
+    output = parser.add_mutually_exclusive_group(required=True)
+    output.add_argument("-o", "--output", help="SQLite file the artifacts are written to")
+    output.add_argument("--ndjson", help="NDJSON file the artifacts are written to, - for stdout")
+    parser.add_argument("-p", "--processes", type=int, default=multiprocessing.cpu_count(),
+        help="number of parser processes (default: one per CPU)")
+    parser.add_argument("--no-recover", action="store_true", help="do not recover deleted rows")
+    parser.add_argument("--temp", help="directory for the database copies (default: system temp)")
+    args = parser.parse_args(argv)
+
+    writer = SqliteWriter(args.output) if args.output else NdjsonWriter(args.ndjson)
+    options = {"recover": not args.no_recover, "temp": args.temp}
+    try:
+        totals = Run(args.roots, writer, max(1, args.processes), options)
+    finally:
+        writer.close()
+    seconds = max(totals["seconds"], 1e-6)
+    print("%d profiles, %d files, %d rows, %.1f MB in %.1f s: %.0f rows/s, %.1f MB/s, %d errors" % (
+        totals["profiles"], totals["files"], totals["rows"], totals["bytes"] / 1e6, seconds,
+        totals["rows"] / seconds, totals["bytes"] / 1e6 / seconds, totals["errors"]), file=sys.stderr)
+    return 1 if totals["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,337 @@
+'''
+@author: Saarthik Tannan
+@contact: saarthik@gmail.com
+'''
+# Host independent reader of the Chromium disk cache, both the blockfile format
+# (index, data_0..data_3 and f_XXXXXX files, Chrome on Windows) and the Simple
+# format (<hash>_0 entry files and index-dir/the-real-index). The files of a cache are
+# opened through a folder object, LocalCacheFolder memory maps the files of a directory
+# and the Autopsy module reads the files straight from the image. Only the index, the
+# entries, the keys and the headers are read, at their offsets. Bodies are never read
+# while walking the entries, body(entry) reads one on request.
+
+# This is free and unencumbered software released into the public domain.
+# See Windows_Chrome_Module.py for the full text of the license.
+
+import os
+import re
+import struct
+from collections import namedtuple
+
+try:
+    import mmap
+except ImportError:
+    # Jython has no mmap, files are read through seek and read instead
+    mmap = None
+
+
+# One cache entry. Times are raw base::Time values (microseconds since 1601-01-01,
+# 0 when unknown) and body is the location the body method of the cache reads from.
+CacheEntry = namedtuple("CacheEntry", "key size created last_used headers body")
+
+
+# Random access to one cache file, subclasses provide __len__, read and close
+class CacheFile(object):
+    def unpack(self, fmt, offset):
+        '''struct.unpack of fmt at offset, None when the file ends before it'''
+        data = self.read(offset, struct.calcsize(fmt))
+        if len(data) != struct.calcsize(fmt):
+            return None
+        return struct.unpack(fmt, data)
+
+
+class MappedFile(CacheFile):
+    '''Read only view of a file, memory mapped where the host has mmap'''
+
+    def __init__(self, path):
+        self.handle = open(path, "rb")
+        self.size = os.fstat(self.handle.fileno()).st_size
+        self.map = None
+        if mmap is not None and self.size > 0:
+            self.map = mmap.mmap(self.handle.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return self.size
+
+    def read(self, offset, length):
+        '''Bytes at offset, shorter than length at the end of the file'''
+        if offset < 0 or length <= 0 or offset >= self.size:
+            return b""
+        if self.map is not None:
+            return self.map[offset:offset + length]
+        self.handle.seek(offset)
+        return self.handle.read(length)
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+        self.handle.close()
+
+
+# The files of a cache directory on disk. A cache folder lists the names of its files,
+# relative to the directory holding the index with "/" separators, and opens them.
+class LocalCacheFolder(object):
+    def __init__(self, path):
+        self.path = path
+
+    def names(self):
+        found = []
+        for root, dirs, files in os.walk(self.path):
+            prefix = os.path.relpath(root, self.path).replace(os.sep, "/")
+            for name in files:
+                found.append(name if prefix == "." else prefix + "/" + name)
+        return sorted(found)
+
+    def open(self, name):
+        '''CacheFile of name, None when it is missing from the folder'''
+        path = os.path.join(self.path, *name.split("/"))
+        return MappedFile(path) if os.path.isfile(path) else None
+
+    def __str__(self):
+        return self.path
+
+
+def ResponseHeaders(data):
+    '''
+    The raw HTTP response headers of a serialized HttpResponseInfo, one header per line.
+    The headers are stored NUL separated and end with an empty line.
+    '''
+    start = data.find(b"HTTP/")
+    if start < 0:
+        return u""
+    end = data.find(b"\x00\x00", start)
+    if end < 0:
+        end = len(data)
+    return data[start:end].replace(b"\x00", b"\r\n").decode("latin-1")
+
+
+# Blockfile format, see net/disk_cache/blockfile/disk_format.h
+BLOCKFILE_INDEX_MAGIC = 0xC103CAC3
+BLOCKFILE_HEADER_SIZE = 8192
+BLOCKFILE_INDEX_HEADER_SIZE = 368
+BLOCKFILE_DEFAULT_TABLE_LEN = 0x10000
+
+# Size of one block of each file type of a cache address, external files excepted
+BLOCK_SIZES = {1: 36, 2: 256, 3: 1024, 4: 4096, 5: 8, 6: 104, 7: 48}
+
+# EntryStore: hash, next, rankings_node, reuse_count, refetch_count, state,
+# creation_time, key_len, long_key, data_size[4], data_addr[4], flags
+_ENTRY_STORE = "<IIIiiiqiI4i4II"
+_ENTRY_KEY_OFFSET = 96
+
+
+def _blockFileName(addr):
+    if (addr >> 28) & 7 == 0:
+        return "f_%06x" % (addr & 0x0FFFFFFF)
+    return "data_%d" % ((addr >> 16) & 0xFF)
+
+
+class BlockfileCache(object):
+    '''Walks the hash table of a blockfile index and the entry chains of its buckets'''
+
+    def __init__(self, folder, index):
+        self.folder = folder
+        self.files = {}
+        self.index = index
+
+    def file(self, name):
+        '''Block or external file, None when it is missing from the folder'''
+        if name not in self.files:
+            self.files[name] = self.folder.open(name)
+        return self.files[name]
+
+    def read(self, addr, length):
+        '''length bytes stored at a cache address'''
+        if not addr & 0x80000000:
+            return b""
+        data = self.file(_blockFileName(addr))
+        if data is None:
+            return b""
+        fileType = (addr >> 28) & 7
+        if fileType == 0:
+            return data.read(0, length)
+        offset = BLOCKFILE_HEADER_SIZE + (addr & 0xFFFF) * BLOCK_SIZES[fileType]
+        return data.read(offset, length)
+
+    def entries(self):
+        header = self.index.unpack("<II", 0)
+        if header is None or header[0] != BLOCKFILE_INDEX_MAGIC:
+            return
+        tableLen = self.index.unpack("<i", 28)[0] or BLOCKFILE_DEFAULT_TABLE_LEN
+        table = self.index.read(BLOCKFILE_INDEX_HEADER_SIZE, tableLen * 4)
+        seen = set()
+        for bucket in struct.unpack("<%dI" % (len(table) // 4), table[:len(table) // 4 * 4]):
+            addr = bucket
+            # A damaged chain may loop, every entry is visited once
+            while addr & 0x80000000 and addr not in seen:
+                seen.add(addr)
+                entry, addr = self.entry(addr)
+                if entry is not None:
+                    yield entry
+
+    def entry(self, addr):
+        '''(CacheEntry, address of the next entry of the bucket) of the entry at addr'''
+        if (addr >> 28) & 7 != 2:
+            return None, 0
+        data = self.read(addr, struct.calcsize(_ENTRY_STORE))
+        if len(data) != struct.calcsize(_ENTRY_STORE):
+            return None, 0
+        fields = struct.unpack(_ENTRY_STORE, data)
+        nextAddr, rankings, created, keyLen, longKey = fields[1], fields[2], fields[6], fields[7], fields[8]
+        sizes, addrs = fields[9:13], fields[13:17]
+
+        if longKey & 0x80000000:
+            key = self.read(longKey, keyLen)
+        else:
+            key = self.read(addr, _ENTRY_KEY_OFFSET + keyLen)[_ENTRY_KEY_OFFSET:]
+        lastUsed = 0
+        node = self.read(rankings, 8)
+        if len(node) == 8:
+            lastUsed = struct.unpack("<q", node)[0]
+
+        # Stream 0 holds the response info with the headers, stream 1 the body
+        headers = ResponseHeaders(self.read(addrs[0], sizes[0])) if sizes[0] > 0 else u""
+        entry = CacheEntry(key.decode("utf-8", "replace"), max(0, sizes[1]), created, lastUsed,
+            headers, (addrs[1], max(0, sizes[1])))
+        return entry, nextAddr
+
+    def body(self, entry):
+        '''Body of entry, external f_XXXXXX bodies must be in the folder'''
+        addr, size = entry.body
+        return self.read(addr, size)
+
+    def close(self):
+        self.index.close()
+        for data in self.files.values():
+            if data is not None:
+                data.close()
+
+
+# Simple format, see net/disk_cache/simple/simple_entry_format.h
+SIMPLE_INITIAL_MAGIC = 0xfcfb6d1ba7725c30
+SIMPLE_FINAL_MAGIC = 0xf4fa6f45970d41d8
+SIMPLE_INDEX_MAGIC = 0x656e74657220796f
+SIMPLE_HEADER = "<QIII4x"
+SIMPLE_EOF = "<QIII4x"
+SIMPLE_FLAG_KEY_SHA256 = 2
+SIMPLE_KEY_SHA256_SIZE = 32
+SIMPLE_ENTRY_FILE = re.compile(r"^([0-9a-f]{16})_0$")
+
+
+def SimpleIndexTimes(data):
+    '''Last used time of every entry hash of a the-real-index CacheFile, empty when it cannot be read'''
+    times = {}
+    if data is None:
+        return times
+    try:
+        # Pickle header (payload size, crc), then magic, version, entry count, cache size
+        header = data.unpack("<IIQIQQ", 0)
+        if header is None or header[2] != SIMPLE_INDEX_MAGIC:
+            return times
+        version, count = header[3], header[4]
+        # Version 8 added the reason the index was written
+        offset = 36 + (4 if version >= 8 else 0)
+        for index in range(count):
+            entry = data.unpack("<QqQ", offset + index * 24)
+            if entry is None:
+                break
+            times[entry[0]] = entry[1]
+    finally:
+        data.close()
+    return times
+
+
+class SimpleCache(object):
+    '''Reads the key and stream 0 of every <hash>_0 entry file from both ends of the file'''
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.times = SimpleIndexTimes(folder.open("index-dir/the-real-index"))
+        if not self.times:
+            # Flat copies keep the real index next to the entry files
+            self.times = SimpleIndexTimes(folder.open("the-real-index"))
+
+    def entries(self):
+        for name in self.folder.names():
+            match = SIMPLE_ENTRY_FILE.match(name)
+            if match is None:
+                continue
+            data = self.folder.open(name)
+            if data is None:
+                continue
+            try:
+                entry = self.entry(data, name, int(match.group(1), 16))
+            finally:
+                data.close()
+            if entry is not None:
+                yield entry
+
+    def entry(self, data, name, hashKey):
+        header = data.unpack(SIMPLE_HEADER, 0)
+        if header is None or header[0] != SIMPLE_INITIAL_MAGIC:
+            return None
+        keyLen = header[2]
+        headerSize = struct.calcsize(SIMPLE_HEADER)
+        eofSize = struct.calcsize(SIMPLE_EOF)
+
+        # Layout: header, key, stream 1, EOF 1, stream 0, optional key SHA-256, EOF 0
+        eof0 = data.unpack(SIMPLE_EOF, len(data) - eofSize)
+        if eof0 is None or eof0[0] != SIMPLE_FINAL_MAGIC:
+            return None
+        end0 = len(data) - eofSize
+        if eof0[1] & SIMPLE_FLAG_KEY_SHA256:
+            end0 -= SIMPLE_KEY_SHA256_SIZE
+        start0 = end0 - eof0[3]
+        eof1 = data.unpack(SIMPLE_EOF, start0 - eofSize)
+        bodyStart = headerSize + keyLen
+        bodySize = 0
+        if eof1 is not None and eof1[0] == SIMPLE_FINAL_MAGIC:
+            bodySize = eof1[3]
+
+        key = data.read(headerSize, keyLen)
+        headers = ResponseHeaders(data.read(start0, eof0[3])) if start0 >= bodyStart else u""
+        return CacheEntry(key.decode("utf-8", "replace"), bodySize, 0, self.times.get(hashKey, 0),
+            headers, (name, bodyStart, bodySize))
+
+    def body(self, entry):
+        name, offset, size = entry.body
+        data = self.folder.open(name)
+        if data is None:
+            return b""
+        try:
+            return data.read(offset, size)
+        finally:
+            data.close()
+
+    def close(self):
+        pass
+
+
+def OpenCache(folder):
+    '''
+    BlockfileCache or SimpleCache for a cache folder or the path of a cache directory,
+    from the magic of its index
+    '''
+    if not hasattr(folder, "open"):
+        folder = LocalCacheFolder(folder)
+    index = folder.open("index")
+    if index is None:
+        raise ValueError("No cache index in " + str(folder))
+    magic = index.unpack("<I", 0)
+    simple = index.unpack("<Q", 0)
+    if magic is not None and magic[0] == BLOCKFILE_INDEX_MAGIC:
+        return BlockfileCache(folder, index)
+    index.close()
+    if simple is not None and simple[0] == SIMPLE_INITIAL_MAGIC:
+        return SimpleCache(folder)
+    raise ValueError("Unknown cache index format in " + str(folder))
+
+
+# Files of a cache directory the entries are read from. Bodies in external
+# f_XXXXXX files and the sparse and stream 2 files of the Simple format are not needed.
+CACHE_FILES = re.compile(r"^(index|data_\d+|[0-9a-f]{16}_0|the-real-index)$")
+
+
+def NeedsCacheFile(name):
+    '''True when the cache file name is read while walking the entries'''
+    return CACHE_FILES.match(name) is not None
@@ -0,0 +1,630 @@
+'''
+@author: Saarthik Tannan
+@contact: saarthik@gmail.com
+'''
+# Host independent recovery of deleted rows from a copied SQLite database and its
+# WAL. The schema of the wanted tables is read from the file itself and turned into
+# record templates: one compiled regular expression matching the record header of
+# every table. The expression runs over the free space only (freelist pages, pages
+# past the end of the database, the unallocated area and freeblocks of table leaf
+# pages) and over every WAL frame, so the scan runs at the speed of the regex engine
+# and only candidate headers are decoded in Python.
+
+# This is free and unencumbered software released into the public domain.
+# See Windows_Chrome_Module.py for the full text of the license.
+
+import os
+import re
+import struct
+
+from Windows_Chrome_Cache import MappedFile
+
+
+SQLITE_MAGIC = b"SQLite format 3\x00"
+WAL_MAGICS = (0x377f0682, 0x377f0683)
+WAL_HEADER_SIZE = 32
+WAL_FRAME_HEADER_SIZE = 24
+
+# B-tree page types
+TABLE_INTERIOR_PAGE = 5
+TABLE_LEAF_PAGE = 13
+
+TEXT_ENCODINGS = {1: "utf-8", 2: "utf-16-le", 3: "utf-16-be"}
+
+# Column classes of a record template, from the declared type affinity
+ROWID, INTEGER, REAL, TEXT, BLOB, ANY = range(6)
+
+
+def _byteClass(values):
+    return "[" + "".join(["\\x%02x" % value for value in values]) + "]"
+
+
+# Serial type varints matched for each column class. Text and blobs longer than
+# two varint bytes (about 8 KB) do not fit a table leaf page and are not carved.
+_SERIAL_PATTERNS = {
+    ROWID: "\\x00",
+    INTEGER: "[\\x01-\\x06\\x08\\x09]",
+    REAL: "[\\x01-\\x09]",
+    TEXT: "(?:%s|[\\x81-\\xff]%s)" % (_byteClass(range(13, 128, 2)), _byteClass(range(1, 128, 2))),
+    BLOB: "(?:%s|[\\x81-\\xff]%s)" % (_byteClass(range(12, 128, 2)), _byteClass(range(0, 128, 2))),
+    ANY: "(?:[\\x00-\\x09]|[\\x0c-\\x7f]|[\\x81-\\xff][\\x00-\\x7f])",
+}
+
+# Serial types of NULL, an empty blob and an empty string, all of them one byte long
+_EMPTY_SERIALS = "[\\x00\\x0c\\x0d]"
+
+# Sizes of the fixed width serial types
+_SERIAL_SIZES = {0: 0, 1: 1, 2: 2, 3: 3, 4: 4, 5: 6, 6: 8, 7: 8, 8: 0, 9: 0}
+
+# Words ending the type of a column definition
+_CONSTRAINT_WORDS = ("CONSTRAINT", "PRIMARY", "NOT", "NULL", "UNIQUE", "CHECK", "DEFAULT",
+    "COLLATE", "REFERENCES", "GENERATED", "AS")
+_TABLE_CONSTRAINTS = ("CONSTRAINT", "PRIMARY", "UNIQUE", "CHECK", "FOREIGN")
+
+
+def Varint(data, offset):
+    '''(value, length) of the SQLite varint at offset, None when data ends inside it'''
+    value = 0
+    for index in range(9):
+        if offset + index >= len(data):
+            return None
+        byte = ord(data[offset + index:offset + index + 1])
+        if index == 8:
+            return (value << 8) | byte, 9
+        value = (value << 7) | (byte & 0x7F)
+        if byte < 0x80:
+            return value, index + 1
+    return None
+
+
+def EncodeVarint(value):
+    '''SQLite varint bytes of a value below 2**56'''
+    encoded = [value & 0x7F]
+    value >>= 7
+    while value:
+        encoded.append(0x80 | (value & 0x7F))
+        value >>= 7
+    return struct.pack("%dB" % len(encoded), *reversed(encoded))
+
+
+def HeaderSerials(raw):
+    '''Serial types of the varints of a record header, None when the last one is cut off'''
+    serials = []
+    value = 0
+    pending = False
+    for byte in bytearray(raw):
+        value = (value << 7) | (byte & 0x7F)
+        pending = byte >= 0x80
+        if not pending:
+            if value in (10, 11):
+                return None
+            serials.append(value)
+            value = 0
+    return None if pending else serials
+
+
+def _splitColumns(body):
+    '''Column and table constraint definitions of a CREATE TABLE body, split at top level commas'''
+    parts = []
+    depth = 0
+    start = 0
+    for index, char in enumerate(body):
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "," and depth == 0:
+            parts.append(body[start:index].strip())
+            start = index + 1
+    parts.append(body[start:].strip())
+    return [part for part in parts if part]
+
+
+def ColumnClasses(sql):
+    '''
+    (name, class, NOT NULL) of every column of a CREATE TABLE statement, the class by SQLite
+    affinity rules
+    '''
+    body = sql[sql.index("(") + 1:sql.rindex(")")]
+    columns = []
+    for definition in _splitColumns(body):
+        words = definition.replace("(", " ( ").split()
+        if words[0].upper() in _TABLE_CONSTRAINTS:
+            continue
+        name = words[0].strip('"`[]').lower()
+        typeWords = []
+        for word in words[1:]:
+            if word.upper() in _CONSTRAINT_WORDS:
+                break
+            typeWords.append(word.upper())
+        declared = " ".join(typeWords)
+        upper = definition.upper()
+        if declared == "INTEGER" and "PRIMARY KEY" in upper and " DESC" not in upper:
+            columnClass = ROWID
+        elif "INT" in declared:
+            columnClass = INTEGER
+        elif "CHAR" in declared or "CLOB" in declared or "TEXT" in declared:
+            columnClass = TEXT
+        elif "BLOB" in declared or not declared:
+            columnClass = BLOB
+        elif "REAL" in declared or "FLOA" in declared or "DOUB" in declared:
+            columnClass = REAL
+        else:
+            columnClass = ANY
+        columns.append((name, columnClass, "NOT NULL" in upper))
+    return columns
+
+
+# Record template of one table: its columns and the record header pattern
+class RecordTemplate(object):
+    __slots__ = ("table", "names", "classes", "headerSizes", "pattern", "headless", "rowidless")
+
+    def __init__(self, table, columns):
+        self.table = table
+        self.names = tuple([name for name, columnClass, required in columns])
+        self.classes = tuple([columnClass for name, columnClass, required in columns])
+        # The header size varint counts itself and one or two bytes per serial type
+        lowest = 1 + len(columns)
+        highest = min(0x7F, 1 + 2 * len(columns))
+        serials = []
+        for name, columnClass, required in columns:
+            serial = _SERIAL_PATTERNS[columnClass]
+            if columnClass != ROWID and not required:
+                # Nullable columns may hold NULL, Chrome adds nullable columns over time
+                serial = "(?:\\x00|%s)" % serial
+            serials.append(serial)
+        # The pattern follows the header size byte, one of headerSizes. Zeroed and wiped
+        # space reads as records of NULLs and empty values only, the lookahead rejects
+        # those before any of them is decoded.
+        self.headerSizes = (lowest, highest)
+        self.pattern = "(?!%s{%d})%s" % (_EMPTY_SERIALS, len(serials), "".join(serials))
+        # A freed cell loses its first four bytes to the freeblock header. With a short
+        # payload size and row ID the header size byte, and the NULL of an INTEGER PRIMARY
+        # KEY column before the other serial types, go with them.
+        self.headless = "(?!%s{%d})%s" % (_EMPTY_SERIALS, len(serials), "".join(serials))
+        self.rowidless = None
+        if self.classes and self.classes[0] == ROWID:
+            self.rowidless = "(?!%s{%d})%s" % (_EMPTY_SERIALS, len(serials) - 1, "".join(serials[1:]))
+
+
+class SqliteImage(object):
+    '''
+    Page level view of a copied database and the WAL next to it. The newest image of a
+    page (its last WAL frame, else the database page) is the state SQLite sees once the
+    WAL is folded in, the database page and earlier frames of the same page are older images.
+    '''
+
+    def __init__(self, path):
+        self.data = MappedFile(path)
+        self.wal = MappedFile(path + "-wal") if os.path.isfile(path + "-wal") else None
+        header = self.data.read(0, 100)
+        if len(header) < 100 or header[:16] != SQLITE_MAGIC:
+            raise ValueError("Not an SQLite database: " + path)
+        pageSize = struct.unpack(">H", header[16:18])[0]
+        self.pageSize = 65536 if pageSize == 1 else pageSize
+        self.usable = self.pageSize - ord(header[20:21])
+        self.encoding = TEXT_ENCODINGS.get(struct.unpack(">I", header[56:60])[0], "utf-8")
+        self.frames = self.WalFrames()
+        self.newest = dict(self.frames)
+
+        # Page count and freelist as of the newest page 1
+        header = self.page(1)[:100]
+        self.filePages = max([len(self.data) // self.pageSize] + list(self.newest))
+        self.pageCount = struct.unpack(">I", header[28:32])[0] or self.filePages
+        self.freelistTrunk, self.freelistCount = struct.unpack(">II", header[32:40])
+
+    def WalFrames(self):
+        '''(page number, offset of the page image) of every frame of the WAL, oldest first'''
+        frames = []
+        if self.wal is None:
+            return frames
+        header = self.wal.unpack(">II", 0)
+        if header is None or header[0] not in WAL_MAGICS:
+            return frames
+        offset = WAL_HEADER_SIZE
+        while offset + WAL_FRAME_HEADER_SIZE + self.pageSize <= len(self.wal):
+            frames.append((self.wal.unpack(">I", offset)[0], offset + WAL_FRAME_HEADER_SIZE))
+            offset += WAL_FRAME_HEADER_SIZE + self.pageSize
+        return frames
+
+    def page(self, number):
+        '''Newest image of a page'''
+        if number in self.newest:
+            return self.wal.read(self.newest[number], self.pageSize)
+        return self.data.read((number - 1) * self.pageSize, self.pageSize)
+
+    def olderImages(self):
+        '''(page number, image) of every image of a page older than its newest one'''
+        for number in sorted(self.newest):
+            image = self.data.read((number - 1) * self.pageSize, self.pageSize)
+            if len(image) == self.pageSize:
+                yield number, image
+        for number, offset in self.frames:
+            if offset != self.newest[number]:
+                yield number, self.wal.read(offset, self.pageSize)
+
+    def cells(self, page, number):
+        '''(page type, offsets of the cells) of a b-tree page image'''
+        start = 100 if number == 1 else 0
+        if len(page) < start + 8:
+            return None, ()
+        kind, cells = ord(page[start:start + 1]), struct.unpack(">H", page[start + 3:start + 5])[0]
+        pointers = start + (12 if kind in (2, 5) else 8)
+        if pointers + 2 * cells > len(page):
+            return None, ()
+        return kind, struct.unpack(">%dH" % cells, page[pointers:pointers + 2 * cells])
+
+    def tableCells(self, root):
+        '''Payload of every cell of the table b-tree at root, overflow pages followed'''
+        pending = [root]
+        seen = set()
+        while pending:
+            number = pending.pop()
+            if number in seen or number < 1:
+                continue
+            seen.add(number)
+            page = self.page(number)
+            kind, cells = self.cells(page, number)
+            if kind == TABLE_INTERIOR_PAGE:
+                start = 100 if number == 1 else 0
+                pending.append(struct.unpack(">I", page[start + 8:start + 12])[0])
+                for cell in cells:
+                    pending.append(struct.unpack(">I", page[cell:cell + 4])[0])
+            elif kind == TABLE_LEAF_PAGE:
+                for cell in cells:
+                    yield self.payload(page, cell)
+
+    def payload(self, page, cell):
+        size, length = Varint(page, cell)
+        rowidLength = Varint(page, cell + length)[1]
+        start = cell + length + rowidLength
+        local = self.localSize(size)
+        data = page[start:start + local]
+        overflow = struct.unpack(">I", page[start + local:start + local + 4])[0] if local < size else 0
+        while overflow and len(data) < size:
+            nextPage = self.page(overflow)
+            data += nextPage[4:self.usable]
+            overflow = struct.unpack(">I", nextPage[:4])[0]
+        return data[:size]
+
+    def localSize(self, size):
+        '''Bytes of a table leaf payload of size stored on the page itself'''
+        maxLocal = self.usable - 35
+        if size <= maxLocal:
+            return size
+        minLocal = (self.usable - 12) * 32 // 255 - 23
+        local = minLocal + (size - minLocal) % (self.usable - 4)
+        return local if local <= maxLocal else minLocal
+
+    def schema(self):
+        '''CREATE TABLE statement of every table, by lower case name'''
+        tables = {}
+        for payload in self.tableCells(1):
+            decoded = DecodeRecord(payload, 0, len(payload), self.encoding)
+            if decoded is None:
+                continue
+            values = decoded[0]
+            if len(values) >= 5 and values[0] == "table" and values[4]:
+                tables[values[1].lower()] = values[4]
+        return tables
+
+    def freelist(self):
+        '''Numbers of every freelist trunk and leaf page'''
+        pages = set()
+        trunk = self.freelistTrunk
+        while trunk and trunk not in pages and trunk <= self.pageCount:
+            pages.add(trunk)
+            data = self.page(trunk)
+            if len(data) < 8:
+                break
+            nextTrunk, leaves = struct.unpack(">II", data[:8])
+            leaves = min(leaves, (self.usable - 8) // 4)
+            pages.update(struct.unpack(">%dI" % leaves, data[8:8 + 4 * leaves]))
+            trunk = nextTrunk
+        return pages
+
+    def unallocated(self, page, number):
+        '''(start, end, is a freeblock) of the unallocated area and of every freeblock of a table leaf page image'''
+        start = 100 if number == 1 else 0
+        freeblock, cells, content = struct.unpack(">HHH", page[start + 1:start + 7])
+        areas = []
+        pointers = start + 8 + 2 * cells
+        if min(content or 65536, len(page)) > pointers:
+            areas.append((pointers, min(content or 65536, len(page)), False))
+        seen = set()
+        while freeblock and freeblock not in seen and freeblock + 4 <= len(page):
+            seen.add(freeblock)
+            nextBlock, size = struct.unpack(">HH", page[freeblock:freeblock + 4])
+            areas.append((freeblock, min(freeblock + size, len(page)), True))
+            freeblock = nextBlock
+        return areas
+
+    def freeRegions(self):
+        '''(image, start, end, is a freeblock) of the free space of the newest and of the older page images'''
+        free = self.freelist()
+        for number in range(1, self.filePages + 1):
+            if number in free or number > self.pageCount:
+                page = self.page(number)
+                yield page, 0, len(page), False
+                continue
+            start = 100 if number == 1 else 0
+            if number in self.newest:
+                header = self.wal.read(self.newest[number] + start, 8)
+            else:
+                header = self.data.read((number - 1) * self.pageSize + start, 8)
+            # Only leaf pages with free bytes are read
+            if len(header) < 8 or ord(header[0:1]) != TABLE_LEAF_PAGE:
+                continue
+            freeblock, cells, content = struct.unpack(">HHH", header[1:7])
+            if freeblock or (content or 65536) - (start + 8 + 2 * cells) > 8:
+                page = self.page(number)
+                for area in self.unallocated(page, number):
+                    yield (page,) + area
+        for number, image in self.olderImages():
+            kind, cells = self.cells(image, number)
+            if kind == TABLE_LEAF_PAGE:
+                for area in self.unallocated(image, number):
+                    yield (image,) + area
+            elif kind not in (2, 5, 10):
+                # Freed or overflow page at the time of the image
+                yield image, 0, len(image), False
+
+    def staleCells(self):
+        '''
+        (image, record header offset, end, row ID) of the cells of older images of table leaf
+        pages whose row ID is gone from the newest image of the same page: rows deleted, or
+        moved by a page split, after the image was written
+        '''
+        newestRowids = {}
+        for number, image in self.olderImages():
+            kind, cells = self.cells(image, number)
+            if kind != TABLE_LEAF_PAGE:
+                continue
+            if number not in newestRowids:
+                page = self.page(number)
+                newestKind, newestCells = self.cells(page, number)
+                newestRowids[number] = set()
+                if newestKind == TABLE_LEAF_PAGE:
+                    for cell in newestCells:
+                        newestRowids[number].add(self.cellRowid(page, cell)[0])
+            for cell in cells:
+                rowid, header, size = self.cellRowid(image, cell)
+                # Rows spilling to overflow pages are not followed, those pages may be reused
+                if rowid is not None and rowid not in newestRowids[number] and self.localSize(size) == size:
+                    yield image, header, header + size, rowid
+
+    def cellRowid(self, page, cell):
+        '''(row ID, offset of the record header, payload size) of a table leaf cell'''
+        size = Varint(page, cell)
+        if size is None:
+            return None, None, 0
+        rowid = Varint(page, cell + size[1])
+        if rowid is None:
+            return None, None, 0
+        return rowid[0], cell + size[1] + rowid[1], size[0]
+
+    def close(self):
+        self.data.close()
+        if self.wal is not None:
+            self.wal.close()
+
+
+def DecodeRecord(data, offset, end, encoding):
+    '''(values, end offset) of the record whose header starts at offset, None when it is not valid'''
+    header = Varint(data, offset)
+    if header is None or header[0] < 2:
+        return None
+    headerEnd = offset + header[0]
+    if headerEnd > end:
+        return None
+    serials = HeaderSerials(data[offset + header[1]:headerEnd])
+    if serials is None:
+        return None
+    return DecodeBody(data, serials, headerEnd, end, encoding)
+
+
+def DecodeBody(data, serials, position, end, encoding):
+    '''(values, end offset) of the record body at position described by serials'''
+    values = []
+    for serial in serials:
+        if serial >= 12:
+            size = (serial - 12) // 2
+        else:
+            size = _SERIAL_SIZES[serial]
+        if position + size > end:
+            return None
+        raw = data[position:position + size]
+        if serial == 0:
+            value = None
+        elif serial == 8:
+            value = 0
+        elif serial == 9:
+            value = 1
+        elif serial == 7:
+            value = struct.unpack(">d", raw)[0]
+        elif serial <= 6:
+            value = struct.unpack(">q", (b"\xff" if ord(raw[0:1]) & 0x80 else b"\x00") * (8 - size) + raw)[0]
+        elif serial % 2:
+            try:
+                value = raw.decode(encoding)
+            except UnicodeDecodeError:
+                return None
+        else:
+            value = raw
+        values.append(value)
+        position += size
+    return values, position
+
+
+def CellRowid(data, start, headerOffset, recordLength):
+    '''
+    Row ID of the cell whose record header is at headerOffset: the payload size and row ID
+    varints are read back from the header, None when they were overwritten (freeblocks)
+    '''
+    size = EncodeVarint(recordLength)
+    for rowidLength in range(1, 10):
+        cell = headerOffset - len(size) - rowidLength
+        if cell < start:
+            break
+        if data[cell:cell + len(size)] == size:
+            rowid = Varint(data, cell + len(size))
+            if rowid is not None and rowid[1] == rowidLength:
+                return rowid[0]
+    return None
+
+
+# Stale cells and free regions scanned between two cancellation checks
+CANCEL_CHECK_REGIONS = 64
+
+# Four zero bytes can start neither a cell nor a freeblock, whose size is never zero
+_ZERO_RUN = b"\x00" * 4
+_NON_ZERO = re.compile(b"[^\x00]")
+
+
+class Carver(object):
+    '''Recovers the records of the wanted tables of a copied database from its free space and WAL'''
+
+    def __init__(self, path, tables):
+        self.image = SqliteImage(path)
+        schema = self.image.schema()
+        self.templates = []
+        for table in tables:
+            if table in schema:
+                self.templates.append(RecordTemplate(table, ColumnClasses(schema[table])))
+        self.pattern = None
+        self.headless = None
+        if self.templates:
+            alternatives = []
+            headless = []
+            for index, template in enumerate(self.templates):
+                alternatives.append("(?<=[\\x%02x-\\x%02x])(?P<t%d>%s)" % (template.headerSizes + (index, template.pattern)))
+                headless.append("(?P<h%d>%s)" % (index, template.headless))
+                if template.rowidless is not None:
+                    headless.append("(?P<r%d>%s)" % (index, template.rowidless))
+            # A record starts with its header size byte, one character class in front of all
+            # the templates lets the search skip every other byte in C
+            lowest = min([template.headerSizes[0] for template in self.templates])
+            highest = max([template.headerSizes[1] for template in self.templates])
+            self.pattern = re.compile(("[\\x%02x-\\x%02x](?:%s)" % (lowest, highest, "|".join(alternatives))).encode("ascii"), re.DOTALL)
+            self.headless = re.compile("|".join(headless).encode("ascii"), re.DOTALL)
+
+    def records(self, isCancelled=None):
+        '''
+        (table, row ID or None, {column: value}) of every candidate record, duplicates dropped.
+        Stops early once isCancelled() is true, it is called every CANCEL_CHECK_REGIONS regions.
+        '''
+        if self.pattern is None:
+            return
+        seen = set()
+        regions = 0
+        # Cells of older page images first, matched in place with their row ID known,
+        # the same rows found again in free space without a row ID are then dropped
+        for data, header, end, rowid in self.image.staleCells():
+            if isCancelled is not None and regions % CANCEL_CHECK_REGIONS == 0 and isCancelled():
+                return
+            regions += 1
+            match = self.pattern.match(data, header, end)
+            found = self.record(match, data, end) if match is not None else None
+            if found is not None and self.unseen(seen, found[0], rowid, found[1]):
+                yield self.row(found[0], rowid, found[1])
+
+        for data, start, end, freeblock in self.image.freeRegions():
+            if isCancelled is not None and regions % CANCEL_CHECK_REGIONS == 0 and isCancelled():
+                return
+            regions += 1
+            position = start
+            # Cells freed together lie next to each other, each may have lost its first
+            # four bytes to a freeblock header, a freeblock starts with such a cell
+            adjacent = freeblock
+            while position < end:
+                if adjacent and data[position:position + 4] == _ZERO_RUN:
+                    # Wiped space after the last cell, the next record is found by searching
+                    adjacent = False
+                    skip = _NON_ZERO.search(data, position, end)
+                    if skip is None:
+                        break
+                    position = skip.start()
+                found = self.adjacentCell(data, position, end) if adjacent else None
+                if found is None:
+                    match = self.pattern.search(data, position, end)
+                    if match is None:
+                        break
+                    found = self.record(match, data, end)
+                    if found is None:
+                        position = match.start() + 1
+                        adjacent = False
+                        continue
+                    found += (CellRowid(data, start, match.start(), found[2] - match.start()),)
+                template, values, position, rowid = found
+                if self.unseen(seen, template, rowid, values):
+                    yield self.row(template, rowid, values)
+                adjacent = True
+
+    def record(self, match, data, end):
+        '''(template, values, end offset) of the record a header match starts, None when it is not valid'''
+        template = self.templates[int(match.lastgroup[1:])]
+        decoded = DecodeRecord(data, match.start(), end, self.image.encoding)
+        if decoded is None or len(decoded[0]) != len(template.names):
+            return None
+        return template, decoded[0], decoded[1]
+
+    def adjacentCell(self, data, cell, end):
+        '''(template, values, end offset, row ID) of the cell at offset cell, intact or without its first four bytes'''
+        size = Varint(data, cell)
+        rowid = Varint(data, cell + size[1]) if size is not None else None
+        if rowid is not None:
+            header = cell + size[1] + rowid[1]
+            match = self.pattern.match(data, header, end)
+            found = self.record(match, data, end) if match is not None else None
+            if found is not None and found[2] - header == size[0]:
+                return found + (rowid[0],)
+        match = self.headless.match(data, cell + 4, end)
+        found = self.headlessRecord(match, data, end) if match is not None else None
+        if found is not None:
+            return found + (None,)
+        return None
+
+    def headlessRecord(self, match, data, end):
+        '''(template, values, end offset) of a headless match, None when it is not valid'''
+        kind, index = match.lastgroup[0], int(match.lastgroup[1:])
+        template = self.templates[index]
+        # The match spans exactly the serial types left, one per column after the lost NULL
+        serials = HeaderSerials(data[match.start():match.end()])
+        if serials is None:
+            return None
+        decoded = DecodeBody(data, ([0] if kind == "r" else []) + serials, match.end(), end, self.image.encoding)
+        if decoded is None:
+            return None
+        return template, decoded[0], decoded[1]
+
+    def unseen(self, seen, template, rowid, values):
+        '''True the first time a record is found, by row ID and by values'''
+        keys = [(template.table, tuple(values))]
+        if rowid is not None:
+            keys.append((template.table, rowid))
+        if [key for key in keys if key in seen]:
+            return False
+        seen.update(keys)
+        return True
+
+    def row(self, template, rowid, values):
+        row = dict(zip(template.names, values))
+        for name, columnClass in zip(template.names, template.classes):
+            if columnClass == ROWID:
+                row[name] = rowid
+        return template.table, rowid, row
+
+    def close(self):
+        self.image.close()
+
+
+def CarveDatabase(path, tables, isCancelled=None):
+    '''
+    Every record of tables recovered from the database at path, read before the WAL is
+    folded in. The list is incomplete when isCancelled() turned true while carving.
+    '''
+    carver = Carver(path, tables)
+    try:
+        return list(carver.records(isCancelled))
+    finally:
+        carver.close()
@@ -0,0 +1,844 @@
+'''
+@author: Saarthik Tannan
+@contact: saarthik@gmail.com
+'''
+# Host independent part of the Windows Chrome parser. The table readers in here
+# only need an object with a rows(sql, params, types) method, so the same SQL and
+# row mapping is used by the Autopsy module (JDBC under Jython) and by plain
+# CPython with the sqlite3 module.
+
+# This is free and unencumbered software released into the public domain.
+# See Windows_Chrome_Module.py for the full text of the license.
+
+import io
+import json
+import numbers
+import os
+import re
+import threading
+from collections import namedtuple, OrderedDict
+
+try:
+    import sqlite3
+except ImportError:
+    # Jython has no sqlite3, the Autopsy module brings its own JDBC source
+    sqlite3 = None
+
+try:
+    from urllib.request import pathname2url
+    from urllib.parse import unquote_plus
+except ImportError:
+    from urllib import pathname2url
+    from urllib import unquote_plus as _unquote_plus
+
+    def unquote_plus(value):
+        # Python 2 unquotes text as latin-1, the bytes are unquoted and decoded as UTF-8 instead
+        return _unquote_plus(value.encode("utf-8")).decode("utf-8", "replace")
+
+from Windows_Chrome_Cache import OpenCache
+
+
+# Directory under which every Chromium based browser (Chrome, Edge, Brave, ...)
+# keeps one sub directory per profile
+USER_DATA_DIR = "User Data"
+
+# Directories above the user name and above the browser vendor in a Windows path
+USER_ROOTS = ("users", "documents and settings")
+APPDATA_ROOTS = ("local", "roaming", "application data")
+
+
+def SplitUserDataPath(parentPath):
+    '''
+    Split a parent path like "/Users/<user>/AppData/Local/Google/Chrome/User Data/<profile>/<sub>/"
+    into (user, browser, profile, sub). Returns None outside of a profile directory.
+    '''
+    marker = "/" + USER_DATA_DIR.lower() + "/"
+    at = parentPath.lower().find(marker)
+    if at < 0:
+        return None
+    profile, sep, sub = parentPath[at + len(marker):].partition("/")
+    if not sep or not profile:
+        return None
+
+    prefix = [part for part in parentPath[:at].split("/") if part]
+    lowered = [part.lower() for part in prefix]
+    user = ""
+    browserStart = 0
+    for index, part in enumerate(lowered):
+        if part in USER_ROOTS and index + 1 < len(prefix) and not user:
+            user = prefix[index + 1]
+        elif part in APPDATA_ROOTS:
+            browserStart = index + 1
+    browser = "/".join(prefix[browserStart:]) or "/".join(prefix[-2:])
+    return user, browser, profile, sub
+
+
+# Drive letter of a Windows path, with or without the \\?\ long path prefix
+_DRIVE_PATH = re.compile(r"^(?:\\\\\?\\)?[A-Za-z]:[\\/]")
+
+
+def SplitTargetPath(targetPath):
+    '''
+    Split a Windows path like "C:\\Users\\<user>\\Downloads\\setup.exe" into the drive, parent
+    path and name the file has in the volume, ("C:", "/Users/<user>/Downloads/", "setup.exe").
+    Returns None for empty, relative and network paths.
+    '''
+    if not targetPath:
+        return None
+    match = _DRIVE_PATH.match(targetPath)
+    if match is None:
+        return None
+    parent, sep, name = targetPath[match.end():].replace("\\", "/").rpartition("/")
+    if not name:
+        return None
+    drive = targetPath[match.end() - 3:match.end() - 1].upper()
+    return drive, ("/" + parent + "/" if parent else "/"), name
+
+
+def HomePath(parentPath):
+    '''"/Users/<user>/" of a parent path inside the home directory of a user, None outside of one'''
+    parts = parentPath.split("/")
+    for index, part in enumerate(parts[:-2]):
+        if part.lower() in USER_ROOTS and parts[index + 1]:
+            return "/".join(parts[:index + 2]) + "/"
+    return None
+
+
+def ProfileDrive(parentPath, locations):
+    '''
+    Drive letter the volume holding the profile at parentPath had, from the split target paths
+    (see SplitTargetPath) of the downloads saved in the same home directory. None when no
+    download was saved there or they disagree, drive letters are not recorded in the image.
+    '''
+    home = HomePath(parentPath)
+    if home is None:
+        return None
+    home = home.lower()
+    drives = set([location[0] for location in locations
+        if location is not None and location[1].lower().startswith(home)])
+    return drives.pop() if len(drives) == 1 else None
+
+
+# Sidecar files SQLite needs next to a database to see its most recent pages
+SQLITE_SIDECARS = ("-wal", "-journal")
+
+# Read tuning applied to every connection of a copied database: memory mapped
+# reads, a large page cache, in memory sorting and no writes at all
+MMAP_SIZE = 256 * 1024 * 1024
+CACHE_SIZE_KIB = 64 * 1024
+READ_PRAGMAS = (
+    "PRAGMA mmap_size=%d" % MMAP_SIZE,
+    "PRAGMA cache_size=-%d" % CACHE_SIZE_KIB,
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA query_only=1",
+)
+
+# Rows fetched per round trip by drivers that stream results
+FETCH_ROWS = 2000
+
+
+def HasSidecars(path):
+    '''True when a -wal or -journal file was copied next to the database'''
+    for suffix in SQLITE_SIDECARS:
+        if os.path.exists(path + suffix):
+            return True
+    return False
+
+
+# The checkpoint statement folding a copied WAL into the private copy of the
+# database. A hot journal is rolled back by simply opening the copy read-write.
+CHECKPOINT = "PRAGMA wal_checkpoint(TRUNCATE)"
+
+
+# Seconds between the WebKit epoch (1601-01-01) and the Unix epoch
+WEBKIT_EPOCH_OFFSET = 11644473600
+
+
+def WebkitToEpoch(column):
+    '''SQL expression turning a WebKit microsecond timestamp column into Unix seconds, 0 when unset'''
+    return "(CASE WHEN %s > 0 THEN %s / 1000000 - %d ELSE 0 END)" % (column, column, WEBKIT_EPOCH_OFFSET)
+
+
+# Core page transition types, the low byte of visits.transition
+TRANSITION_TYPES = ("LINK", "TYPED", "AUTO_BOOKMARK", "AUTO_SUBFRAME", "MANUAL_SUBFRAME",
+    "GENERATED", "AUTO_TOPLEVEL", "FORM_SUBMIT", "RELOAD", "KEYWORD", "KEYWORD_GENERATED")
+
+
+def TransitionName(column):
+    '''SQL expression naming the core transition type of a visits.transition column'''
+    cases = " ".join(["WHEN %d THEN '%s'" % (code, name) for code, name in enumerate(TRANSITION_TYPES)])
+    return "(CASE %s & 255 %s ELSE 'UNKNOWN' END)" % (column, cases)
+
+
+# Search engines as (site, path prefix, query parameter). The site is the registered
+# domain without its suffix, so "google" covers google.com, google.co.uk and so on.
+SEARCH_RULES = (
+    ("google", "/search", "q"),
+    ("bing", "/search", "q"),
+    ("duckduckgo", "/", "q"),
+    ("youtube", "/results", "search_query"),
+    ("yahoo", "/search", "p"),
+    ("yandex", "/search", "text"),
+    ("baidu", "/s", "wd"),
+    ("ecosia", "/search", "q"),
+    ("brave", "/search", "q"),
+    ("startpage", "/", "query"),
+    ("qwant", "/", "q"),
+    ("ask", "/web", "q"),
+    ("wikipedia", "/w/index.php", "search"),
+    ("amazon", "/s", "k"),
+)
+
+# The rules of every site, looked up once per host
+SEARCH_INDEX = {}
+for _site, _path, _param in SEARCH_RULES:
+    SEARCH_INDEX.setdefault(_site, []).append((_path, _param))
+
+# Second level labels under which country suffixes register domains (example.co.uk)
+SECOND_LEVEL_LABELS = frozenset(("ac", "co", "com", "edu", "go", "gob", "gov", "mil", "ne", "net", "or", "org"))
+
+# URL authorities whose parse is kept, far more hosts than a profile usually visits
+HOST_CACHE_SIZE = 8192
+
+# Distinct URLs whose parts one read of a table with repeated URLs keeps
+URL_MEMO_SIZE = 4096
+
+# Scheme, optional user info, host and optional port of a URL, the path starts at its end
+_URL_HOST = re.compile(r"^[A-Za-z][A-Za-z0-9+.\-]*://(?:[^/?#@]*@)?(\[[^\]/?#]*\]|[^/?#:]*)(?::\d*)?")
+_IP_HOST = re.compile(r"^(?:\[.*\]|[\d.]+)$")
+_NO_URL_PARTS = (u"", u"", u"")
+
+
+def RegisteredDomain(host):
+    '''The domain a lowercased host name is registered under, the host itself for IP addresses'''
+    if "." not in host or _IP_HOST.match(host):
+        return host
+    labels = host.rstrip(".").split(".")
+    count = 3 if len(labels) > 2 and len(labels[-1]) == 2 and labels[-2] in SECOND_LEVEL_LABELS else 2
+    return ".".join(labels[-count:])
+
+
+# (host, domain, no search terms), search rules and offset of the path of a URL by its
+# scheme and authority, the URL up to the first "/" after "://". Bounded to
+# HOST_CACHE_SIZE entries, the oldest is evicted one at a time. A lookup is one hash
+# of the slice and takes no lock, only inserts and evictions do.
+_urlHosts = OrderedDict()
+_urlHostsLock = threading.Lock()
+
+
+def _parseAuthority(key):
+    match = _URL_HOST.match(key)
+    if match is None or not match.group(1):
+        return _NO_URL_PARTS, (), 0
+    host = match.group(1).lower()
+    domain = RegisteredDomain(host)
+    return (host, domain, u""), SEARCH_INDEX.get(domain.partition(".")[0], ()), match.end()
+
+
+def SearchTerms(rest, rules):
+    '''Search terms in the path and query rest of a URL of a search engine with rules'''
+    path, sep, query = rest.partition("?")
+    if not sep:
+        return u""
+    path = path or "/"
+    pairs = query.partition("#")[0].split("&")
+    for prefix, param in rules:
+        if not path.startswith(prefix):
+            continue
+        # Only the one parameter is unquoted, not the whole query
+        key = param + "="
+        for pair in pairs:
+            if pair.startswith(key):
+                terms = unquote_plus(pair[len(key):]).strip()
+                if terms:
+                    return terms
+    return u""
+
+
+def UrlParts(url):
+    '''
+    (host, registered domain, search terms) of a URL, empty for what it does not have.
+    The URL up to the first "/" after "://" is parsed once and cached, only URLs of
+    search engines have their query parsed.
+    '''
+    if not url:
+        return _NO_URL_PARTS
+    # "http://" and "https://" end before offset 8, for them the first "/" from there
+    # ends the key. Only real keys are stored, any other slice misses and is redone.
+    end = url.find("/", 8)
+    entry = _urlHosts.get(url[:end] if end > 0 else url)
+    if entry is None:
+        scheme = url.find("://")
+        if scheme < 0:
+            return _NO_URL_PARTS
+        # The host never extends past the first "/" after "://", the key parses the same as the URL
+        end = url.find("/", scheme + 3)
+        key = url[:end] if end > 0 else url
+        entry = _urlHosts.get(key)
+        if entry is None:
+            entry = _parseAuthority(key)
+            with _urlHostsLock:
+                _urlHosts[key] = entry
+                if len(_urlHosts) > HOST_CACHE_SIZE:
+                    _urlHosts.popitem(False)
+    parts, rules, start = entry
+    if not rules:
+        return parts
+    return parts[0], parts[1], SearchTerms(url[start:], rules)
+
+
+# Records yielded by the table readers, the first field is always the row ID. The
+# host, domain and search terms of history URLs are appended by ReadTable.
+UrlRecord = namedtuple("UrlRecord", "id url title visit_count last_visit_time host domain search_terms")
+VisitRecord = namedtuple("VisitRecord", "id url title visit_time from_url transition host domain search_terms")
+DownloadRecord = namedtuple("DownloadRecord", "id target_path end_time tab_url")
+TopSiteRecord = namedtuple("TopSiteRecord", "rowid url url_rank title")
+CookieRecord = namedtuple("CookieRecord", "rowid host_key name value path creation_utc last_access_utc")
+LoginRecord = namedtuple("LoginRecord", "rowid origin_url username_value date_created")
+AutofillRecord = namedtuple("AutofillRecord", "rowid name value count date_created date_last_used")
+BookmarkRecord = namedtuple("BookmarkRecord", "id url name date_added folder")
+PreferenceRecord = namedtuple("PreferenceRecord", "rowid name value")
+CacheRecord = namedtuple("CacheRecord", "rowid url size created last_used headers")
+
+
+# One table of a Chrome database: the query reading the rows above a row ID, the
+# column types ("i" integer, "s" text) and record it yields, and the artifact and
+# attributes (attribute type name, record field, value kind) each row maps to. The
+# record of a reader with an enrich field ends with the UrlParts of that field, which
+# are kept per URL for the read when the field repeats from row to row.
+# "optional" attributes are strings left out of the artifact when they are empty.
+class TableReader(object):
+    __slots__ = ("table", "query", "types", "record", "artifact", "attributes", "enrich", "repeats")
+
+    def __init__(self, table, query, types, record, artifact, attributes, enrich=None, repeats=False):
+        self.table = table
+        self.query = query
+        self.types = types
+        self.record = record
+        self.artifact = artifact
+        self.attributes = attributes
+        self.enrich = enrich
+        self.repeats = repeats
+
+
+# WebKit timestamps are converted to Unix seconds inside the queries so the row
+# loops never do date arithmetic
+
+URLS = TableReader("urls",
+    "SELECT id, url, title, visit_count, %s FROM urls WHERE id > ? ORDER BY id" % WebkitToEpoch("last_visit_time"),
+    "issii", UrlRecord, "TSK_WEB_HISTORY",
+    (("TSK_URL", "url", "string"),
+     ("TSK_TITLE", "title", "string"),
+     ("TSK_VALUE", "visit_count", "string"),
+     ("TSK_DATETIME_ACCESSED", "last_visit_time", "long"),
+     ("TSK_DOMAIN", "domain", "optional"),
+     ("TSK_CHROME_HOST", "host", "optional"),
+     ("TSK_CHROME_SEARCH_TERMS", "search_terms", "optional")),
+    "url")
+
+# Every visit joined to its url and to the url of the visit it came from
+VISITS = TableReader("visits",
+    "SELECT visits.id, urls.url, urls.title, %s, referrer.url, %s FROM visits"
+    " JOIN urls ON urls.id = visits.url"
+    " LEFT JOIN visits AS source ON source.id = visits.from_visit AND visits.from_visit > 0"
+    " LEFT JOIN urls AS referrer ON referrer.id = source.url"
+    " WHERE visits.id > ? ORDER BY visits.id" % (WebkitToEpoch("visits.visit_time"), TransitionName("visits.transition")),
+    "ississ", VisitRecord, "TSK_CHROME_VISITS",
+    (("TSK_URL", "url", "string"),
+     ("TSK_TITLE", "title", "string"),
+     ("TSK_DATETIME_ACCESSED", "visit_time", "long"),
+     ("TSK_REFERRER", "from_url", "string"),
+     ("TSK_VALUE", "transition", "string"),
+     ("TSK_DOMAIN", "domain", "optional"),
+     ("TSK_CHROME_HOST", "host", "optional"),
+     ("TSK_CHROME_SEARCH_TERMS", "search_terms", "optional")),
+    "url", repeats=True)
+
+DOWNLOADS = TableReader("downloads",
+    "SELECT id, target_path, %s, tab_url FROM downloads WHERE id > ? ORDER BY id" % WebkitToEpoch("end_time"),
+    "isis", DownloadRecord, "TSK_WEB_DOWNLOAD",
+    (("TSK_PATH", "target_path", "string"),
+     ("TSK_DATETIME_ACCESSED", "end_time", "long"),
+     ("TSK_URL", "tab_url", "string")))
+
+TOP_SITES = TableReader("top_sites",
+    "SELECT rowid, url, url_rank, title FROM top_sites WHERE rowid > ? ORDER BY rowid",
+    "isis", TopSiteRecord, "TSK_CHROME_TOPSITES",
+    (("TSK_URL", "url", "string"),
+     ("TSK_VALUE", "url_rank", "string"),
+     ("TSK_TITLE", "title", "string")))
+
+COOKIES = TableReader("cookies",
+    "SELECT rowid, host_key, name, value, path, %s, %s FROM cookies WHERE rowid > ? ORDER BY rowid"
+        % (WebkitToEpoch("creation_utc"), WebkitToEpoch("last_access_utc")),
+    "issssii", CookieRecord, "TSK_WEB_COOKIE",
+    (("TSK_URL", "host_key", "string"),
+     ("TSK_NAME", "name", "string"),
+     ("TSK_VALUE", "value", "string"),
+     ("TSK_DATETIME_CREATED", "creation_utc", "long"),
+     ("TSK_DATETIME_ACCESSED", "last_access_utc", "long")))
+
+LOGINS = TableReader("logins",
+    "SELECT rowid, origin_url, username_value, %s FROM logins WHERE rowid > ? ORDER BY rowid" % WebkitToEpoch("date_created"),
+    "issi", LoginRecord, "TSK_SERVICE_ACCOUNT",
+    (("TSK_URL", "origin_url", "string"),
+     ("TSK_USER_ID", "username_value", "string"),
+     ("TSK_DATETIME_CREATED", "date_created", "long")))
+
+# Autofill dates are already Unix seconds
+AUTOFILL = TableReader("autofill",
+    "SELECT rowid, name, value, count, date_created, date_last_used FROM autofill WHERE rowid > ? ORDER BY rowid",
+    "issiii", AutofillRecord, "TSK_WEB_FORM_AUTOFILL",
+    (("TSK_NAME", "name", "string"),
+     ("TSK_VALUE", "value", "string"),
+     ("TSK_COUNT", "count", "int"),
+     ("TSK_DATETIME_CREATED", "date_created", "long"),
+     ("TSK_DATETIME_ACCESSED", "date_last_used", "long")))
+
+
+# Matches one JSON token after optional whitespace and separators. A string, number
+# or literal cut by the end of the buffer does not match or ends at the buffer end,
+# in both cases the parser reads more before trusting the token. A number may also be
+# cut in the middle ("12." of "12.75", "1e" of "1e5"), so numbers and literals are only
+# complete when one of _JSON_DELIMITERS follows them.
+_JSON_TOKEN = re.compile(r'[\s,:]*(?:"((?:[^"\\]|\\.)*)"|([{}\[\]])|(-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)|(true|false|null))')
+_JSON_LITERALS = {"true": True, "false": False, "null": None}
+_JSON_EVENTS = {"{": "start_map", "[": "start_array", "}": "end_map", "]": "end_array"}
+_JSON_DELIMITERS = frozenset(",]} \t\r\n")
+
+# Characters read from a JSON file at a time
+JSON_CHUNK = 64 * 1024
+
+
+def JsonEvents(stream, chunkSize=JSON_CHUNK):
+    '''
+    Incremental JSON parser over a text stream, yields (path, event, value) where event is
+    start_map, end_map, start_array, end_array or value and path is the tuple of map keys
+    down to the event. Only the current chunk and the open containers are held in memory.
+    '''
+    buf = ""
+    pos = 0
+    eof = False
+    path = []
+    stack = []
+    key = None
+    while True:
+        match = _JSON_TOKEN.match(buf, pos)
+        if match is not None and match.end() < len(buf) and match.lastindex >= 3 and buf[match.end()] not in _JSON_DELIMITERS:
+            match = None
+        if match is None or (match.end() == len(buf) and not eof):
+            if eof:
+                if buf[pos:].strip(" \t\r\n,:"):
+                    raise ValueError("Invalid JSON near: " + buf[pos:pos + 40])
+                return
+            chunk = stream.read(chunkSize)
+            eof = not chunk
+            buf = buf[pos:] + chunk
+            pos = 0
+            continue
+        pos = match.end()
+        text, bracket, number, literal = match.groups()
+
+        if bracket == "}" or bracket == "]":
+            opened, keyed = stack.pop()
+            yield tuple(path), _JSON_EVENTS[bracket], None
+            if keyed:
+                path.pop()
+            continue
+
+        inMap = bool(stack) and stack[-1][0] == "{"
+        if text is not None:
+            value = json.loads('"%s"' % text) if "\\" in text else text
+            if inMap and key is None:
+                key = value
+                continue
+        owner = key if inMap else None
+        key = None
+
+        if bracket is not None:
+            if owner is not None:
+                path.append(owner)
+            stack.append((bracket, owner is not None))
+            yield tuple(path), _JSON_EVENTS[bracket], None
+            continue
+        if number is not None:
+            value = float(number) if "." in number or "e" in number or "E" in number else int(number)
+        elif literal is not None:
+            value = _JSON_LITERALS[literal]
+        if owner is not None:
+            yield tuple(path) + (owner,), "value", value
+        else:
+            yield tuple(path), "value", value
+
+
+def WebkitSeconds(value):
+    '''Unix seconds of a WebKit microsecond timestamp given as a number or string, 0 when unset'''
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return 0
+    return value // 1000000 - WEBKIT_EPOCH_OFFSET if value > 0 else 0
+
+
+def ParseBookmarks(stream, since=0):
+    '''
+    Every url node of a Bookmarks file with an ID above since, in ID order. Chrome writes
+    the keys of a node sorted, so a folder's name follows its children: url nodes wait in
+    their folder until it closes. They are yielded once the whole file is read, sorted so
+    that the highest ID written is a watermark below which every node is written.
+    '''
+    frames = []
+    records = []
+    for path, event, value in JsonEvents(stream):
+        if event == "start_map":
+            frames.append(({}, []))
+        elif event == "value" and frames and path:
+            frames[-1][0][path[-1]] = value
+        elif event == "end_map":
+            fields, pending = frames.pop()
+            if fields.get("type") == "url":
+                nodeId = int(fields.get("id", 0) or 0)
+                if nodeId > since:
+                    pending.append((nodeId, fields.get("url"), fields.get("name"),
+                        WebkitSeconds(fields.get("date_added")), []))
+            elif fields.get("type") == "folder":
+                for record in pending:
+                    record[4].append(fields.get("name") or "")
+
+            # Nodes in a "children" array belong to the enclosing folder
+            if frames and path and path[-1] == "children":
+                frames[-1][1].extend(pending)
+            else:
+                records.extend(pending)
+    records.sort(key=lambda record: record[0])
+    for nodeId, url, name, added, folders in records:
+        yield BookmarkRecord(nodeId, url, name, added, "/".join(reversed(folders)))
+
+
+# Dotted Preferences keys, and the prefixes of keys, worth reporting
+PREFERENCE_KEYS = ("account_info", "download.default_directory", "download.prompt_for_download",
+    "savefile.default_directory", "profile.name", "homepage", "session.startup_urls",
+    "default_search_provider", "google.services", "sync")
+
+
+def ParsePreferences(stream, since=0):
+    '''
+    Scalar values under PREFERENCE_KEYS. Preferences has no stable row IDs, the row ID
+    is always 0: once read the table is completed (see UNMARKED_TABLES) and not read again.
+    '''
+    for path, event, value in JsonEvents(stream):
+        if event != "value" or not path:
+            continue
+        name = ".".join(path)
+        for prefix in PREFERENCE_KEYS:
+            if name == prefix or name.startswith(prefix + "."):
+                yield PreferenceRecord(0, name, value)
+                break
+
+
+# A JSON file of a profile: the incremental parser yielding its records and the
+# artifact and attributes each record maps to, like a TableReader
+class JsonReader(object):
+    __slots__ = ("table", "parse", "record", "artifact", "attributes")
+
+    def __init__(self, table, parse, record, artifact, attributes):
+        self.table = table
+        self.parse = parse
+        self.record = record
+        self.artifact = artifact
+        self.attributes = attributes
+
+
+BOOKMARKS = JsonReader("bookmarks", ParseBookmarks, BookmarkRecord, "TSK_WEB_BOOKMARK",
+    (("TSK_URL", "url", "string"),
+     ("TSK_TITLE", "name", "string"),
+     ("TSK_DATETIME_CREATED", "date_added", "long"),
+     ("TSK_COMMENT", "folder", "string")))
+
+PREFERENCES = JsonReader("preferences", ParsePreferences, PreferenceRecord, "TSK_CHROME_PREFERENCES",
+    (("TSK_NAME", "name", "string"),
+     ("TSK_VALUE", "value", "string")))
+
+# Cache keys may be prefixed with the cache split keys ("1/0/_dk_<site> <frame> <url>"),
+# the URL is always the last part
+_CACHE_KEY_PREFIX = re.compile(r"^(?:\d+/\d+/)?(?:_dk_.* )?")
+
+
+def CacheUrl(key):
+    '''The URL of a disk cache entry key'''
+    return _CACHE_KEY_PREFIX.sub("", key, 1)
+
+
+def ParseCache(folder, since=0):
+    '''
+    Every entry of the disk cache folder, blockfile or Simple format. Cache entries have
+    no stable row IDs, the row ID is always 0: once read the table is completed (see
+    UNMARKED_TABLES) and not read again.
+    '''
+    cache = OpenCache(folder)
+    try:
+        for entry in cache.entries():
+            yield CacheRecord(0, CacheUrl(entry.key), entry.size, WebkitSeconds(entry.created),
+                WebkitSeconds(entry.last_used), entry.headers)
+    finally:
+        cache.close()
+
+
+# A cache directory of a profile: the parser yielding the records of the copied
+# directory and the artifact and attributes each record maps to, like a JsonReader
+class CacheReader(object):
+    __slots__ = ("table", "parse", "record", "artifact", "attributes")
+
+    def __init__(self, table, parse, record, artifact, attributes):
+        self.table = table
+        self.parse = parse
+        self.record = record
+        self.artifact = artifact
+        self.attributes = attributes
+
+
+CACHE = CacheReader("cache", ParseCache, CacheRecord, "TSK_WEB_CACHE",
+    (("TSK_URL", "url", "string"),
+     ("TSK_VALUE", "size", "string"),
+     ("TSK_DATETIME_CREATED", "created", "long"),
+     ("TSK_DATETIME_ACCESSED", "last_used", "long"),
+     ("TSK_HEADERS", "headers", "string")))
+
+# Recovered rows are only trusted with a time between 1990 and 2100
+WEBKIT_MIN = (631152000 + WEBKIT_EPOCH_OFFSET) * 1000000
+WEBKIT_MAX = (4102444800 + WEBKIT_EPOCH_OFFSET) * 1000000
+
+_URL_SCHEME = re.compile(r"^[A-Za-z][A-Za-z0-9+.\-]*:")
+
+
+def _isTime(value):
+    return isinstance(value, numbers.Integral) and WEBKIT_MIN < value < WEBKIT_MAX
+
+
+def _isUrl(value):
+    return isinstance(value, type(u"")) and _URL_SCHEME.match(value) is not None
+
+
+def _transition(value):
+    if isinstance(value, numbers.Integral) and 0 <= value & 255 < len(TRANSITION_TYPES):
+        return TRANSITION_TYPES[value & 255]
+    return "UNKNOWN"
+
+
+# Rows of a table recovered from the free space and WAL of a database: the carved
+# table, the check a carved row must pass, the query telling whether the row is still
+# live (with its parameters) and the record built from it, with the artifact and
+# attributes of the record like a TableReader. Recovered rows have row ID 0.
+class CarvedReader(object):
+    __slots__ = ("table", "source", "accept", "live", "params", "build", "record", "artifact", "attributes")
+
+    def __init__(self, table, source, accept, live, params, build, record, artifact, attributes):
+        self.table = table
+        self.source = source
+        self.accept = accept
+        self.live = live
+        self.params = params
+        self.build = build
+        self.record = record
+        self.artifact = artifact
+        self.attributes = attributes
+
+
+# Resolves the url IDs of recovered visits, from the live urls table and from the
+# recovered urls rows of the same database
+class CarvedUrls(object):
+    def __init__(self, source, carved):
+        self.source = source
+        self.carved = dict([(row["id"], row) for table, rowid, row in carved if table == "urls" and rowid is not None])
+        self.cache = {}
+
+    def get(self, urlId):
+        if urlId not in self.cache:
+            found = (u"", u"")
+            for url, title in self.source.rows("SELECT url, title FROM urls WHERE id = ?", (urlId,), "ss"):
+                found = (url, title)
+            if urlId in self.carved and not found[0]:
+                found = (self.carved[urlId].get("url"), self.carved[urlId].get("title"))
+            self.cache[urlId] = found
+        return self.cache[urlId]
+
+
+RECOVERED_URLS = CarvedReader("recovered_urls", "urls",
+    lambda row: _isUrl(row.get("url")) and (row.get("last_visit_time") == 0 or _isTime(row.get("last_visit_time"))),
+    # Chrome updates urls rows in place, an older copy of a live url is not recovered history
+    "SELECT 1 FROM urls WHERE url = ?", lambda row: (row["url"],),
+    lambda row, urls: UrlRecord(0, row["url"], row.get("title"), row.get("visit_count"),
+        WebkitSeconds(row.get("last_visit_time")), *UrlParts(row["url"])),
+    UrlRecord, "TSK_CHROME_RECOVERED_HISTORY", URLS.attributes)
+
+RECOVERED_VISITS = CarvedReader("recovered_visits", "visits",
+    lambda row: isinstance(row.get("url"), numbers.Integral) and row["url"] > 0 and _isTime(row.get("visit_time")),
+    "SELECT 1 FROM visits WHERE id = ? OR (url = ? AND visit_time = ?)",
+    lambda row: (row["id"] if row["id"] is not None else -1, row["url"], row["visit_time"]),
+    lambda row, urls: VisitRecord(0, urls.get(row["url"])[0], urls.get(row["url"])[1],
+        WebkitSeconds(row["visit_time"]), u"", _transition(row.get("transition")), *UrlParts(urls.get(row["url"])[0])),
+    VisitRecord, "TSK_CHROME_RECOVERED_VISITS", VISITS.attributes)
+
+RECOVERED_DOWNLOADS = CarvedReader("recovered_downloads", "downloads",
+    lambda row: isinstance(row.get("target_path"), type(u"")) and _isTime(row.get("start_time")),
+    "SELECT 1 FROM downloads WHERE id = ? OR (target_path = ? AND start_time = ?)",
+    lambda row: (row["id"] if row["id"] is not None else -1, row["target_path"], row["start_time"]),
+    lambda row, urls: DownloadRecord(0, row["target_path"], WebkitSeconds(row.get("end_time")), row.get("tab_url")),
+    DownloadRecord, "TSK_CHROME_RECOVERED_DOWNLOADS", DOWNLOADS.attributes)
+
+RECOVERED_TOP_SITES = CarvedReader("recovered_top_sites", "top_sites",
+    lambda row: _isUrl(row.get("url")),
+    "SELECT 1 FROM top_sites WHERE url = ?", lambda row: (row["url"],),
+    lambda row, urls: TopSiteRecord(0, row["url"], row.get("url_rank"), row.get("title")),
+    TopSiteRecord, "TSK_CHROME_RECOVERED_TOPSITES", TOP_SITES.attributes)
+
+# Tables whose records all have row ID 0, a watermark cannot tell which of them are
+# already on the blackboard. Once all of one is written the table is marked completed
+# for its database and not read again, unless ingest is not incremental.
+UNMARKED_TABLES = frozenset((PREFERENCES.table, CACHE.table, RECOVERED_URLS.table, RECOVERED_VISITS.table,
+    RECOVERED_DOWNLOADS.table, RECOVERED_TOP_SITES.table))
+
+# Attribute types the module adds to the case, with their display names and value kinds
+CUSTOM_ATTRIBUTES = (
+    ("TSK_CHROME_HOST", "Host", "string"),
+    ("TSK_CHROME_SEARCH_TERMS", "Search Terms", "string"),
+    ("TSK_CHROME_FILE_SIZE", "File Size", "long"),
+)
+
+# Artifact types the module adds to the case, with their display names
+CUSTOM_ARTIFACTS = (
+    ("TSK_CHROME_TOPSITES", "Chrome Top Sites"),
+    ("TSK_CHROME_VISITS", "Chrome Visits"),
+    ("TSK_CHROME_PREFERENCES", "Chrome Preferences"),
+    ("TSK_CHROME_RECOVERED_HISTORY", "Chrome Recovered History"),
+    ("TSK_CHROME_RECOVERED_VISITS", "Chrome Recovered Visits"),
+    ("TSK_CHROME_RECOVERED_DOWNLOADS", "Chrome Recovered Downloads"),
+    ("TSK_CHROME_RECOVERED_TOPSITES", "Chrome Recovered Top Sites"),
+)
+
+
+# One file of a profile: the paths it may have relative to the profile directory,
+# whether it is a "sqlite" or "json" file or the "cache" index of a cache directory,
+# the readers run over it, in order, and the readers of rows recovered from it
+class ProfileFile(object):
+    __slots__ = ("paths", "kind", "readers", "carvers")
+
+    def __init__(self, paths, kind, readers, carvers=()):
+        self.paths = paths
+        self.kind = kind
+        self.readers = readers
+        self.carvers = carvers
+
+
+# Registry of everything read from a profile. Each file is copied and opened once
+# and all of its readers run over that one copy or connection.
+EXTRACTORS = (
+    ProfileFile(("History",), "sqlite", (URLS, VISITS, DOWNLOADS), (RECOVERED_URLS, RECOVERED_VISITS, RECOVERED_DOWNLOADS)),
+    ProfileFile(("Top Sites",), "sqlite", (TOP_SITES,), (RECOVERED_TOP_SITES,)),
+    ProfileFile(("Network/Cookies", "Cookies"), "sqlite", (COOKIES,)),
+    ProfileFile(("Login Data",), "sqlite", (LOGINS,)),
+    ProfileFile(("Web Data",), "sqlite", (AUTOFILL,)),
+    ProfileFile(("Bookmarks",), "json", (BOOKMARKS,)),
+    ProfileFile(("Preferences",), "json", (PREFERENCES,)),
+    ProfileFile(("Cache/Cache_Data/index", "Cache/index"), "cache", (CACHE,)),
+)
+
+
+def OpenJson(path):
+    '''Text stream over a JSON file of a profile'''
+    return io.open(path, "r", encoding="utf-8-sig")
+
+
+def ReadJson(stream, reader, since=0):
+    '''Generator of reader.record for every record of a JSON file with a row ID above since'''
+    return reader.parse(stream, since)
+
+
+def ReadCache(folder, reader, since=0):
+    '''
+    Generator of reader.record for every entry of a cache, folder is the path of the cache
+    directory or a cache folder object (see Windows_Chrome_Cache.LocalCacheFolder)
+    '''
+    return reader.parse(folder, since)
+
+
+def ReadTable(source, reader, since=0):
+    '''
+    Generator of reader.record for every row of reader.table with a row ID above since,
+    the rows of source are tuples
+    '''
+    make = reader.record._make
+    if reader.enrich is None:
+        for row in source.rows(reader.query, (since,), reader.types):
+            yield make(row)
+        return
+    index = reader.record._fields.index(reader.enrich)
+    if not reader.repeats:
+        for row in source.rows(reader.query, (since,), reader.types):
+            yield make(row + UrlParts(row[index]))
+        return
+    # Visits repeat the URLs of the pages visited again, each one is parsed once
+    memo = OrderedDict()
+    for row in source.rows(reader.query, (since,), reader.types):
+        url = row[index]
+        parts = memo.get(url)
+        if parts is None:
+            parts = memo[url] = UrlParts(url)
+            if len(memo) > URL_MEMO_SIZE:
+                memo.popitem(False)
+        yield make(row + parts)
+
+
+def EstimateRows(source, reader, since=0):
+    '''Cheap estimate of the rows ReadTable will yield, from the highest rowid of the table'''
+    for row in source.rows("SELECT MAX(rowid) FROM %s" % reader.table, (), "i"):
+        return max(0, (row[0] or 0) - since)
+    return 0
+
+
+def RecoveredRecords(source, reader, carved):
+    '''
+    Generator of reader.record for the rows of reader.source carved from the database
+    (see Windows_Chrome_Carver.CarveDatabase) that pass its check and are no longer live
+    '''
+    urls = CarvedUrls(source, carved)
+    for table, rowid, row in carved:
+        if table != reader.source or not reader.accept(row):
+            continue
+        live = False
+        for found in source.rows(reader.live, reader.params(row), "i"):
+            live = True
+        if not live:
+            yield reader.build(row, urls)
+
+
+def AttributeValues(reader, record):
+    '''(attribute type name, value kind, value) of every attribute a record maps to'''
+    return [(name, kind, getattr(record, field)) for name, field, kind in reader.attributes]
+
+
+# Source of rows for the readers over CPython's sqlite3 module. The copy is
+# checkpointed once if it has sidecars and then opened immutable, read only.
+class SqliteSource(object):
+    def __init__(self, path):
+        if sqlite3 is None:
+            raise ImportError("sqlite3 is not available")
+        if HasSidecars(path):
+            writable = sqlite3.connect(path)
+            try:
+                writable.execute(CHECKPOINT)
+            finally:
+                writable.close()
+        try:
+            uri = "file:%s?immutable=1" % pathname2url(os.path.abspath(path))
+            self.connection = sqlite3.connect(uri, uri=True)
+        except (TypeError, sqlite3.Error):
+            self.connection = sqlite3.connect(path)
+        for pragma in READ_PRAGMAS:
+            self.connection.execute(pragma)
+
+    def rows(self, sql, params, types):
+        return self.connection.execute(sql, params)
+
+    def close(self):
+        self.connection.close()
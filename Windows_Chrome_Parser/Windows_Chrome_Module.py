@@ -40,15 +40,28 @@ try:
     import datetime
     
     import jarray
-    import inspect
     import os
-    from urlparse import urlparse, parse_qs
+    import shutil
+    import sys
+    import threading
     
     from java.lang import Class
+    from java.lang import IllegalArgumentException
+    from java.lang import Integer
+    from java.lang import Long
     from java.lang import System
+    from java.security import MessageDigest
     from java.sql  import DriverManager, SQLException
+    from java.util import Properties
     from java.util.logging import Level
     from java.io import File
+    from java.io import FileOutputStream
+    from javax.swing import BoxLayout
+    from javax.swing import JCheckBox
+    from javax.swing import JLabel
+    from javax.swing import JPanel
+    from javax.swing import JSpinner
+    from javax.swing import SpinnerNumberModel
     
     # Autopsy imports
     from org.sleuthkit.datamodel import SleuthkitCase
@@ -56,6 +69,7 @@ try:
     from org.sleuthkit.datamodel import ReadContentInputStream
     from org.sleuthkit.datamodel import BlackboardArtifact
     from org.sleuthkit.datamodel import BlackboardAttribute
+    from org.sleuthkit.datamodel import TskData
     from org.sleuthkit.autopsy.ingest import IngestModule
     from org.sleuthkit.autopsy.ingest.IngestModule import IngestModuleException
     from org.sleuthkit.autopsy.ingest import DataSourceIngestModule
@@ -71,11 +85,23 @@ try:
     from org.sleuthkit.autopsy.casemodule.services import Services
     from org.sleuthkit.autopsy.casemodule.services import FileManager
     from org.sleuthkit.autopsy.datamodel import ContentUtils
+
+    # Table readers shared with the host independent parser
+    from Windows_Chrome_Core import SplitTargetPath, ProfileDrive
+    from Windows_Chrome_Core import CUSTOM_ARTIFACTS, CUSTOM_ATTRIBUTES, EXTRACTORS, ReadTable, EstimateRows, OpenJson, ReadJson, ReadCache
+    from Windows_Chrome_Core import RecoveredRecords, UNMARKED_TABLES
+    from Windows_Chrome_Cache import CacheFile, NeedsCacheFile
+    from Windows_Chrome_Carver import CarveDatabase
+    from Windows_Chrome_Pipeline import ProfileIndex, DatabaseUnit, WatermarkStore, WatermarkPath, ExtractionPipeline, ParseWorkerPool
+    from Windows_Chrome_Pipeline import JobCancelled, ProgressTracker, PhaseTimer, ArtifactBatchWriter
+    from Windows_Chrome_Pipeline import WORKER_THREADS, ARTIFACT_CHUNK_SIZE, CANCEL_CHECK_ROWS
+    from Windows_Chrome_Core import SQLITE_SIDECARS, READ_PRAGMAS, FETCH_ROWS, CHECKPOINT, HasSidecars
     
 # Print message if error
 except ImportError as e:
     print("Error: ", str(e))
 
+
 # Factory that defines the name and details of the module and allows Autopsy
 # to create instances of the modules that will do the anlaysis.
 class ParseWindowsChromeIngestModuleFactory(IngestModuleFactoryAdapter):
@@ -100,23 +126,415 @@ class ParseWindowsChromeIngestModuleFactory(IngestModuleFactoryAdapter):
     def isDataSourceIngestModuleFactory(self):
         return True
 
+    def getDefaultIngestJobSettings(self):
+        return ParseWindowsChromeSettings()
+
+    def hasIngestJobSettingsPanel(self):
+        return True
+
+    def getIngestJobSettingsPanel(self, settings):
+        if not isinstance(settings, ParseWindowsChromeSettings):
+            raise IllegalArgumentException("Expected settings argument to be an instance of ParseWindowsChromeSettings")
+        self.settings = settings
+        return ParseWindowsChromeSettingsPanel(self.settings)
+
     # Can return null if isDataSourceIngestModuleFactory returns false
     def createDataSourceIngestModule(self, ingestOptions):
+        # The settings of the ingest job, the panel's when it was not shown for this job
+        if isinstance(ingestOptions, ParseWindowsChromeSettings):
+            return ParseWindowsChromeIngestModule(ingestOptions)
         return ParseWindowsChromeIngestModule(self.settings)
 
 
+# Largest number of parser threads and artifacts per chunk the settings panel offers
+MAX_WORKER_THREADS = 32
+MAX_ARTIFACT_CHUNK_SIZE = 100000
+
+
+# Ingest job settings: recover deleted rows, only parse what changed since the last
+# run, the number of parser threads and the number of artifacts written per transaction
+class ParseWindowsChromeSettings(IngestModuleIngestJobSettings):
+    serialVersionUID = 1
+
+    def __init__(self):
+        self.recover = True
+        self.incremental = True
+        self.threads = WORKER_THREADS
+        self.chunkSize = ARTIFACT_CHUNK_SIZE
+
+    def getVersionNumber(self):
+        return self.serialVersionUID
+
+
+# Settings panel shown in the ingest module list, every change is written straight
+# to the settings it was created with
+class ParseWindowsChromeSettingsPanel(IngestModuleIngestJobSettingsPanel):
+    def __init__(self, settings):
+        self.local_settings = settings
+        self.initComponents()
+        self.customizeComponents()
+
+    def recoverEvent(self, event):
+        self.local_settings.recover = self.recoverBox.isSelected()
+
+    def incrementalEvent(self, event):
+        self.local_settings.incremental = self.incrementalBox.isSelected()
+
+    def threadsEvent(self, event):
+        self.local_settings.threads = int(self.threadsSpinner.getValue())
+
+    def chunkSizeEvent(self, event):
+        self.local_settings.chunkSize = int(self.chunkSizeSpinner.getValue())
+
+    def initComponents(self):
+        self.setLayout(BoxLayout(self, BoxLayout.Y_AXIS))
+        self.recoverBox = JCheckBox("Recover deleted history, downloads and top sites", actionPerformed=self.recoverEvent)
+        self.add(self.recoverBox)
+        self.incrementalBox = JCheckBox("Only parse what changed since the last run", actionPerformed=self.incrementalEvent)
+        self.add(self.incrementalBox)
+        self.threadsSpinner = JSpinner(SpinnerNumberModel(WORKER_THREADS, 1, MAX_WORKER_THREADS, 1), stateChanged=self.threadsEvent)
+        self.add(self.labeled("Parser threads:", self.threadsSpinner))
+        self.chunkSizeSpinner = JSpinner(SpinnerNumberModel(ARTIFACT_CHUNK_SIZE, 1, MAX_ARTIFACT_CHUNK_SIZE, 100), stateChanged=self.chunkSizeEvent)
+        self.add(self.labeled("Artifacts per transaction:", self.chunkSizeSpinner))
+
+    def labeled(self, text, component):
+        row = JPanel()
+        row.add(JLabel(text))
+        row.add(component)
+        return row
+
+    def customizeComponents(self):
+        self.recoverBox.setSelected(self.local_settings.recover)
+        self.incrementalBox.setSelected(self.local_settings.incremental)
+        self.threadsSpinner.setValue(self.local_settings.threads)
+        self.chunkSizeSpinner.setValue(self.local_settings.chunkSize)
+
+    def getSettings(self):
+        return self.local_settings
+
+
+# Size of the buffer used to stream files out of the image
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+# Attributes of the file a download was saved to: its object ID, size and MD5
+TARGET_FILE_ATTRIBUTES = ("TSK_PATH_ID", "TSK_CHROME_FILE_SIZE", "TSK_HASH_MD5")
+
+
+def FileSystemId(file):
+    '''ID of the file system holding a file of the image, None for local, carved and other files'''
+    try:
+        return file.getFileSystemId()
+    except AttributeError:
+        return None
+
+
+# Files of a data source by file system, lowercased parent path and name, for the target
+# paths of downloads. A directory is looked up by its name in its own parent the first
+# time a download points into it and its children are listed, so the cost follows the
+# directories, not the downloads, and never the files below them.
+# The image does not record drive letters: a target path is only looked up on the file
+# system of the profile, when its drive is the one the profile's home directory was on.
+class TargetFileIndex(object):
+    def __init__(self, fileManager, dataSource, isCancelled, bufferSize=COPY_BUFFER_SIZE):
+        self.fileManager = fileManager
+        self.dataSource = dataSource
+        self.isCancelled = isCancelled
+        self.bufferSize = bufferSize
+        self.files = {}
+        self.directories = set()
+        self.hashes = {}
+        self.queries = 0
+        self.lock = threading.Lock()
+
+    def resolve(self, targetPaths, database):
+        '''
+        The file, or None, of every target path of the downloads of a profile database file,
+        listing the directories not indexed yet
+        '''
+        locations = [SplitTargetPath(path) for path in targetPaths]
+        drive = ProfileDrive(database.getParentPath(), locations)
+        volume = FileSystemId(database)
+        if drive is None or volume is None:
+            return [None] * len(locations)
+        locations = [location if location is not None and location[0] == drive else None for location in locations]
+        with self.lock:
+            for parent in sorted(set([location[1] for location in locations if location is not None])):
+                if (volume, parent.lower()) not in self.directories:
+                    self.index(volume, parent)
+            return [self.files.get((volume, location[1].lower(), location[2].lower())) if location is not None else None
+                for location in locations]
+
+    def index(self, volume, parent):
+        if self.isCancelled():
+            raise JobCancelled()
+        self.directories.add((volume, parent.lower()))
+        # Listing "/" would return the whole data source, downloads to a drive root stay unresolved
+        if parent == "/":
+            return
+        self.queries += 1
+        grandParent, sep, name = parent.rstrip("/").rpartition("/")
+        grandParent += "/"
+        # The parent path is matched as a substring and the name with LIKE, directories
+        # of the same name deeper down or on other volumes are dropped here
+        for directory in self.fileManager.findFiles(self.dataSource, name, grandParent):
+            if (not directory.isDir() or directory.getName().lower() != name.lower()
+                    or directory.getParentPath().lower() != grandParent.lower() or FileSystemId(directory) != volume):
+                continue
+            for file in directory.getChildren():
+                if file.isDir():
+                    continue
+                key = (volume, parent.lower(), file.getName().lower())
+                # An allocated file wins over deleted files of the same name
+                current = self.files.get(key)
+                if current is None or (file.isMetaFlagSet(TskData.TSK_FS_META_FLAG_ENUM.ALLOC)
+                        and not current.isMetaFlagSet(TskData.TSK_FS_META_FLAG_ENUM.ALLOC)):
+                    self.files[key] = file
+
+    def md5(self, file):
+        '''MD5 of file, from the case when it was hashed already, otherwise read once from the image'''
+        if file.getMd5Hash():
+            return file.getMd5Hash()
+        with self.lock:
+            md5 = self.hashes.get(file.getId())
+        if md5 is None:
+            md5 = self.digest(file)
+            with self.lock:
+                self.hashes[file.getId()] = md5
+        return md5
+
+    def digest(self, file):
+        buf = jarray.zeros(self.bufferSize, "b")
+        digest = MessageDigest.getInstance("MD5")
+        stream = ReadContentInputStream(file)
+        try:
+            read = stream.read(buf)
+            while read > 0:
+                # Large downloads are hashed in many buffers, stop promptly when cancelled
+                if self.isCancelled():
+                    raise JobCancelled()
+                digest.update(buf, 0, read)
+                read = stream.read(buf)
+        finally:
+            stream.close()
+        return "".join(["%02x" % (value & 0xFF) for value in digest.digest()])
+
+
+# Bytes read from the image at a time by the cache reader
+CACHE_READ_AHEAD = 64 * 1024
+
+
+# One disk cache file read in place from the image through AbstractFile.read. Entries,
+# keys and headers are small reads close to each other, they are served from a read
+# ahead buffer instead of one image read each.
+class ImageCacheFile(CacheFile):
+    def __init__(self, file, readAhead=CACHE_READ_AHEAD):
+        self.file = file
+        self.size = file.getSize()
+        self.readAhead = readAhead
+        self.start = 0
+        self.data = b""
+
+    def __len__(self):
+        return self.size
+
+    def read(self, offset, length):
+        '''Bytes at offset, shorter than length at the end of the file'''
+        if offset < 0 or length <= 0 or offset >= self.size:
+            return b""
+        end = min(offset + length, self.size)
+        if offset < self.start or end > self.start + len(self.data):
+            count = min(max(length, self.readAhead), self.size - offset)
+            buf = jarray.zeros(count, "b")
+            read = self.file.read(buf, offset, count)
+            self.start = offset
+            self.data = buf[:max(0, read)].tostring()
+        return self.data[offset - self.start:end - self.start]
+
+    def close(self):
+        self.data = b""
+
+
+# The files of a disk cache directory in the image, by their path relative to the
+# directory of the index. The cache is never copied out, bodies in data_N and
+# <hash>_0 files are skipped by reading only the ranges the cache reader asks for.
+class ImageCacheFolder(object):
+    def __init__(self, index, files):
+        self.label = index.getUniquePath()
+        parent = index.getParentPath()
+        self.files = {}
+        for file in [index] + list(files):
+            self.files[file.getParentPath()[len(parent):] + file.getName()] = file
+
+    def names(self):
+        return sorted(self.files)
+
+    def open(self, name):
+        file = self.files.get(name)
+        return ImageCacheFile(file) if file is not None else None
+
+    def __str__(self):
+        return self.label
+
+
+# Streams files out of the image to a directory of their own below the temp
+# directory, keyed by object ID so profiles with the same file names never collide.
+# Disk caches are read in place and not copied.
+class TempExtractor(object):
+    def __init__(self, tempDir, timer, isCancelled, bufferSize=COPY_BUFFER_SIZE):
+        self.tempDir = tempDir
+        self.timer = timer
+        self.isCancelled = isCancelled
+        self.bufferSize = bufferSize
+
+    def extract(self, unit):
+        '''Copy the database and its sidecars next to each other, returns the path of the copy'''
+        if unit.kind == "cache":
+            return None
+        folder = os.path.join(self.tempDir, str(unit.file.getId()))
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+        path = os.path.join(folder, unit.file.getName())
+        try:
+            with self.timer.phase("copy", unit.profile.label, unit.file.getName(), "bytes") as run:
+                for content in [unit.file] + list(unit.sidecars):
+                    run.count += self.copy(content, os.path.join(folder, content.getName()))
+        except:
+            self.remove(path)
+            raise
+        return path
+
+    def copy(self, content, path):
+        buf = jarray.zeros(self.bufferSize, "b")
+        stream = ReadContentInputStream(content)
+        out = FileOutputStream(path)
+        total = 0
+        try:
+            read = stream.read(buf)
+            while read > 0:
+                # Large files are copied in many buffers, stop promptly when cancelled
+                if self.isCancelled():
+                    raise JobCancelled()
+                out.write(buf, 0, read)
+                total += read
+                read = stream.read(buf)
+        finally:
+            out.close()
+            stream.close()
+        return total
+
+    def remove(self, path):
+        shutil.rmtree(os.path.dirname(path), True)
+
+
+# sqlite-jdbc open_mode flags: SQLITE_OPEN_READONLY | SQLITE_OPEN_URI
+JDBC_OPEN_READONLY_URI = 0x01 | 0x40
+
+
+# Opens copied databases for reading. The driver is registered once per JVM, a
+# copied WAL or hot journal is folded into the private copy first, then the copy is
+# opened immutable and read only, so SQLite takes no locks, with the read pragmas applied.
+class JdbcConnectionFactory(object):
+    _registered = False
+    _lock = threading.Lock()
+
+    @classmethod
+    def register(cls):
+        with cls._lock:
+            if not cls._registered:
+                Class.forName("org.sqlite.JDBC")
+                cls._registered = True
+
+    @classmethod
+    def open(cls, path):
+        cls.register()
+        if HasSidecars(path):
+            writable = DriverManager.getConnection("jdbc:sqlite:%s" % path)
+            try:
+                stmt = writable.createStatement()
+                stmt.execute(CHECKPOINT)
+                stmt.close()
+            finally:
+                writable.close()
+
+        props = Properties()
+        props.setProperty("open_mode", str(JDBC_OPEN_READONLY_URI))
+        try:
+            dbConn = DriverManager.getConnection("jdbc:sqlite:%s?immutable=1" % File(path).toURI().toString(), props)
+        except SQLException:
+            # Drivers without URI filenames still get a read only connection
+            props.setProperty("open_mode", "1")
+            dbConn = DriverManager.getConnection("jdbc:sqlite:%s" % path, props)
+
+        stmt = dbConn.createStatement()
+        try:
+            for pragma in READ_PRAGMAS:
+                stmt.execute(pragma)
+        finally:
+            stmt.close()
+        return dbConn
+
+
+# Thin JDBC adapter giving the Windows_Chrome_Core table readers the rows of a database
+class JdbcSource(object):
+    def __init__(self, path):
+        self.connection = JdbcConnectionFactory.open(path)
+
+    def rows(self, sql, params, types):
+        stmt = self.connection.prepareStatement(sql)
+        stmt.setFetchSize(FETCH_ROWS)
+        try:
+            for index, param in enumerate(params):
+                if isinstance(param, basestring):
+                    stmt.setString(index + 1, param)
+                else:
+                    stmt.setLong(index + 1, param)
+            resultSet = stmt.executeQuery()
+            # Bound getters per column so the row loop does no type dispatch
+            getters = []
+            for index, columnType in enumerate(types):
+                getters.append((resultSet.getLong if columnType == "i" else resultSet.getString, index + 1))
+            while resultSet.next():
+                yield tuple([get(column) for get, column in getters])
+        finally:
+            stmt.close()
+
+    def close(self):
+        self.connection.close()
+
+
 # Data source-level ingest module. One gets created per thread
 class ParseWindowsChromeIngestModule(DataSourceIngestModule):    
     
     _logger = Logger.getLogger(ParseWindowsChromeIngestModuleFactory.moduleName)
     
     def log(self, level, msg):
-        self._logger.logp(level, self.__class__.__name__, inspect.stack()[1][3], msg)
+        # Only the calling frame is needed for the method name, not the whole stack
+        if self._logger.isLoggable(level):
+            self._logger.logp(level, self.__class__.__name__, sys._getframe(1).f_code.co_name, msg)
+
+    def Count(self, name, amount=1):
+        '''Aggregate row level events instead of logging one line per row'''
+        with self.countersLock:
+            self.counters[name] = self.counters.get(name, 0) + amount
         
     def __init__(self, settings):
         self.context = None
         self.local_settings = settings
         self.ChromeArtifactsList = []
+        self.chunkSize = getattr(settings, "chunkSize", ARTIFACT_CHUNK_SIZE)
+        self.threads = getattr(settings, "threads", WORKER_THREADS)
+        self.writer = None
+        self.timer = None
+        self.counters = {}
+        self.countersLock = threading.Lock()
+        self.profiles = None
+        self.targets = None
+        self.mappings = None
+        self.progress = None
+        self.incremental = getattr(settings, "incremental", True)
+        self.recover = getattr(settings, "recover", True)
+        self.watermarks = None
     
     # Where any setup and configuration is done
     # 'context' is an instance of org.sleuthkit.autopsy.ingest.IngestJobContext.
@@ -140,278 +558,311 @@ class ParseWindowsChromeIngestModule(DataSourceIngestModule):
         # We don't know how much work is there yet
         progressBar.switchToIndeterminate()
         self.log(Level.INFO, "Starting process")
-        self.log(Level.INFO, "Chrome History and Downloads")
-        self.ChromeHistory(dataSource, progressBar)
-        self.log(Level.INFO, "Chrome Top Sites")
-        self.ChromeTopSites(dataSource, progressBar)
+        self.timer = PhaseTimer()
+        self.counters = {}
+        self.writer = ArtifactBatchWriter(Case.getCurrentCase().getSleuthkitCase(),
+            ParseWindowsChromeIngestModuleFactory.moduleName, self.chunkSize, self.timer)
+
+        # Enumerate the "User Data" trees once, every extractor works from the index
+        fileManager = Case.getCurrentCase().getServices().getFileManager()
+        try:
+            self.profiles = ProfileIndex().build(fileManager, dataSource)
+        except Exception as e:
+            self.log(Level.INFO, "Could not enumerate browser profiles: " + str(e))
+            return IngestModule.ProcessResult.OK
+        self.Count("profiles", len(self.profiles.profiles))
+        self.targets = TargetFileIndex(fileManager, dataSource, self.context.isJobCancelled)
+
+        # Copy the databases in the background, parse them on the worker pool and
+        # write the artifacts from this thread only
+        self.log(Level.INFO, "Chrome History, Top Sites, Cookies, Login Data, Web Data, Bookmarks, Preferences and Cache")
+        try:
+            self.mappings = self.ArtifactMappings()
+            self.watermarks = WatermarkStore(WatermarkPath(os.path.join(Case.getCurrentCase().getModuleDirectory(), "Windows Chrome"), dataSource.getId()))
+            units = self.DatabaseUnits()
+            self.progress = ProgressTracker(progressBar, units)
+            pipeline = ExtractionPipeline(TempExtractor(self.CreateTempDir(), self.timer, self.context.isJobCancelled), units, self.context.isJobCancelled)
+            pool = ParseWorkerPool(self.threads, self.chunkSize, self.context.isJobCancelled)
+            try:
+                pool.run(pipeline, self.ParseUnit, self.WriteRows, self.ParseFailed, self.ParseFinished)
+            finally:
+                # Every chunk is its own transaction, so on cancel the rows already
+                # handed over are written whole and their watermarks kept. After a
+                # failed chunk the watermarks of the last run are left as they are.
+                self.Count("download directories indexed", self.targets.queries)
+                self.writer.flush()
+                if not self.writer.failed:
+                    self.watermarks.save()
+        except Exception as e:
+            self.log(Level.INFO, "Error: " + str(e))
+        if self.context.isJobCancelled():
+            return IngestModule.ProcessResult.OK
         self.log(Level.INFO, "Ending process")
         
         # Post a message to rhw ingest messages in box
         message = IngestMessage.createMessage(IngestMessage.MessageType.DATA, 
             "Windows Chrome", "Chrome artifacts have been analyzed")
         IngestServices.getInstance().postMessage(message) 
+        self.PostSummary()
         
         return IngestModule.ProcessResult.OK
+
+    def PostSummary(self):
+        '''Log the phase timings and counters and post them to the ingest inbox'''
+        lines = self.timer.summary()
+        for name in sorted(self.counters):
+            lines.append("%s: %d" % (name, self.counters[name]))
+        for line in lines:
+            self.log(Level.INFO, line)
+        message = IngestMessage.createMessage(IngestMessage.MessageType.INFO,
+            "Windows Chrome", "Chrome parse timings (%d artifacts in %d chunks)" % (self.writer.artifactCount, self.writer.chunkCount),
+            "<br>".join(lines))
+        IngestServices.getInstance().postMessage(message)
     
     
     def CreateTempDir(self):
-        # Create Temp directory
-        tempDir = Case.getCurrentCase().getTempDirectory()
+        # Create Temp directory, one sub directory per module so other modules' files are left alone
+        tempDir = os.path.join(Case.getCurrentCase().getTempDirectory(), "Windows Chrome")
         self.log(Level.INFO, "Creating temp directory:  " + tempDir)
         try:
-            os.mkdir(tempDir)
+            os.makedirs(tempDir)
             return tempDir
         except:
             self.log(Level.INFO, "temp directory already exists")
             return tempDir
     
-    '''  
-    def date_from_webkit(self, webkit_timestamp):
-        # Convert end_time (chrome webkit time format) to human-readable date & Unix time
-        epoch_start = datetime.datetime(1601,1,1)
-        delta = datetime.timedelta(microseconds=int(webkit_timestamp))
-        time = epoch_start + delta
-        return time
-    '''   
-     
-    def ChromeHistory(self, dataSource, progressBar):
+
+    def DatabaseUnits(self):
+        '''Every registered file of every profile with its sidecars, profile by profile'''
+        units = []
+        for key in sorted(self.profiles.profiles):
+            profile = self.profiles.profiles[key]
+            for extractor in EXTRACTORS:
+                for relPath in extractor.paths:
+                    for file in profile.get(relPath):
+                        sidecars = []
+                        if extractor.kind == "sqlite":
+                            for suffix in SQLITE_SIDECARS:
+                                sidecars.extend(profile.get(relPath + suffix))
+                        elif extractor.kind == "cache":
+                            # Block and entry files only, bodies stay in the image
+                            sidecars.extend([sibling for path, sibling in profile.siblings(relPath)
+                                if NeedsCacheFile(sibling.getName())])
+                        units.append(DatabaseUnit(profile, file, sidecars, extractor))
+        return [unit for unit in units if self.Changed(unit)]
+
+    def Changed(self, unit):
+        '''Load the watermarks of unit, False when it is skipped as unchanged since the last run'''
+        if not self.watermarks.prepare(unit) and self.incremental:
+            self.Count("unchanged databases skipped")
+            return False
+        if not self.incremental:
+            unit.marks = {}
+            unit.completed = set()
+        return True
+
+    def ArtifactMappings(self):
         '''
-        Parse and save history (urls and downloads) to SQL database, and
-        import to the extracted view section of Autopsy
+        Create the custom artifact and attribute types and resolve, once for the parsers, the
+        artifact type, the (attribute type ID, value converter, record index, optional) and
+        the target path index and target file attribute type IDs of every table
         '''
-        try:
-            # We don't know how much work there is yet
-            progressBar.switchToIndeterminate()
-        
-            # Set the database to be read
-            skCase = Case.getCurrentCase().getSleuthkitCase()
-            fileManager = Case.getCurrentCase().getServices().getFileManager()
-            
+        skCase = Case.getCurrentCase().getSleuthkitCase()
+        blackboard = skCase.getBlackboard()
+        # Data artifact types, the only ones newDataArtifact accepts
+        for artName, displayName in CUSTOM_ARTIFACTS:
             try:
+                blackboard.getOrAddArtifactType(artName, displayName, BlackboardArtifact.Category.DATA_ARTIFACT)
+            except:
+                self.log(Level.FINE, "Attributes creation error: " + artName)
+        valueTypes = {
+            "string": BlackboardAttribute.TSK_BLACKBOARD_ATTRIBUTE_VALUE_TYPE.STRING,
+            "long": BlackboardAttribute.TSK_BLACKBOARD_ATTRIBUTE_VALUE_TYPE.LONG,
+        }
+        for attName, displayName, kind in CUSTOM_ATTRIBUTES:
+            try:
+                blackboard.getOrAddAttributeType(attName, valueTypes[kind], displayName)
+            except:
+                self.log(Level.FINE, "Attributes creation error: " + attName)
+        converters = {
+            "string": lambda value: u"" if value is None else unicode(value),
+            "optional": lambda value: unicode(value),
+            "int": lambda value: Integer(value or 0),
+            "long": lambda value: Long(value or 0),
+        }
+        # Downloads also get the ID, size and MD5 of the file they were saved to
+        targetTypes = tuple([skCase.getAttributeType(attName).getTypeID() for attName in TARGET_FILE_ATTRIBUTES])
+        mappings = {}
+        for extractor in EXTRACTORS:
+            for reader in extractor.readers + extractor.carvers:
+                attributes = []
+                for attName, field, kind in reader.attributes:
+                    typeID = skCase.getAttributeType(attName).getTypeID()
+                    attributes.append((typeID, converters[kind], reader.record._fields.index(field), kind == "optional"))
+                targets = None
+                if "target_path" in reader.record._fields:
+                    targets = (reader.record._fields.index("target_path"),) + targetTypes
+                mappings[reader.table] = (skCase.getArtifactType(reader.artifact), attributes, targets)
+        return mappings
+
+    def WriteRows(self, unit, rows):
+        '''Hand a chunk of parsed rows to the blackboard writer, runs on the ingest thread'''
+        marks = {}
+        completed = []
+        for table, rowId, artType, attributes in rows:
+            if attributes is None:
+                # End of a table without row IDs, all of it is handed over
+                completed.append(table)
+                continue
+            if table != self.writer.table or unit.profile.label != self.writer.profile:
+                self.writer.begin(unit.profile.label, table)
+            self.writer.add(unit.file, artType, attributes)
+            if rowId > marks.get(table, 0):
+                marks[table] = rowId
+        # The watermarks advance once the rows are committed
+        self.writer.after(lambda: self.RowsWritten(unit, marks, completed))
+        self.progress.advance(unit, len(rows))
+
+    def RowsWritten(self, unit, marks, completed):
+        for table, rowId in marks.items():
+            if rowId > unit.mark(table):
+                unit.marks[table] = rowId
+        unit.completed.update(completed)
+        self.watermarks.update(unit, False)
+
+    def ParseFailed(self, unit, error):
+        unit.failed = True
+        if isinstance(error, JobCancelled):
+            return
+        self.Count("errors: " + unit.file.getName())
+        self.log(Level.INFO, "Could not parse " + unit.file.getUniquePath() + ": " + str(error))
+
+    def ParseFinished(self, unit):
+        # The fingerprint is stored once the last rows of the unit are committed
+        self.writer.after(lambda: self.watermarks.update(unit, not unit.failed))
+        self.progress.finish(unit)
+
+    def ParseUnit(self, unit, lclDbPath, emit):
+        '''
+        Run every reader of one copied profile file and emit the rows for the
+        extracted view section of Autopsy, runs on a worker thread
+        '''
+        if unit.kind == "json":
+            # JSON files are parsed incrementally, never loaded whole
+            for reader in unit.pending(unit.readers):
+                stream = OpenJson(lclDbPath)
                 try:
-                    files = fileManager.findFiles(dataSource, "History", "Users/%/AppData/Local/Google/Chrome/User Data/Default")
-                
-                except Exception as e:
-                    self.log(Level.INFO, "Could not find History file" + e.getMessage())
-                    return IngestModule.ProcessResult.OK
-                
-                fileCount = 0
-                
-                # Create temp directory
-                tempDir = self.CreateTempDir()
-                self.log(Level.INFO, "tempDir: " + tempDir)
-                
-                # Write the Event Log file to temp directory 
-                for file in files:
-                    # Check if the user cancelled the module
-                    if self.context.isJobCancelled():
-                        return IngestModule.ProcessResult.OK
-                    
-                    fileCount += 1
-                    self.log(Level.INFO, "filename: " + file.getName())
-                    self.log(Level.INFO, "tempDir: " + tempDir)
-                    # Save the database to the temp directory
-                    lclDbPath = os.path.join(tempDir, file.getName())
-                    ContentUtils.writeToFile(file, File(lclDbPath))
-                  
-                for file in files:
-                    if file.getName() == "History":
-                        # Check if OS is Windows otherwise stop
-                        if not PlatformUtil.isWindowsOS():
-                            self.log(Level.INFO, "Not running on Windows so stopping process")
-                            return IngestModule.ProcessResult.OK
-                            
-                        # Open the database using JDBC. Connect to the database
-                        lclDbPath = os.path.join(Case.getCurrentCase().getTempDirectory(), "History")
-                        Class.forName("org.sqlite.JDBC").newInstance()
-                        dbConn = DriverManager.getConnection("jdbc:sqlite:%s"  % lclDbPath)
-                        
-                        # Query the urls table in the History database for some of the columns
-                        stmt = dbConn.createStatement()
-                        history_query = "Select url, title, visit_count FROM urls"
-                        self.log(Level.INFO, history_query)
-                        resultSet = stmt.executeQuery(history_query)
-                        self.log(Level.INFO, history_query)
-                        self.log(Level.INFO, "Query History table")
-                        
-                        # Create the artifacts
-                        artName = "TSK_WEB_HISTORY"
-                        artIDHist = skCase.getArtifactTypeID(artName)
-                        artIDHistEvt = skCase.getArtifactType(artName)
-                            
-                        # Cycle through each row to create artifacts
-                        while resultSet.next():
-                            try:
-                                art = file.newArtifact(artIDHist)
-                                self.log(Level.INFO, "Inserting attribute url")
-                                art.addAttribute(BlackboardAttribute(BlackboardAttribute.ATTRIBUTE_TYPE.TSK_URL.getTypeID(), ParseWindowsChromeIngestModuleFactory.moduleName, resultSet.getString("url")))
-                                self.log(Level.INFO, "Inserting attribute title")
-                                art.addAttribute(BlackboardAttribute(BlackboardAttribute.ATTRIBUTE_TYPE.TSK_TITLE.getTypeID(), ParseWindowsChromeIngestModuleFactory.moduleName, resultSet.getString("title")))
-                                self.log(Level.INFO, "Inserting attribute visit_count")
-                                art.addAttribute(BlackboardAttribute(BlackboardAttribute.ATTRIBUTE_TYPE.TSK_VALUE.getTypeID(), ParseWindowsChromeIngestModuleFactory.moduleName, resultSet.getString("visit_count")))             
-                                
-                                
-                            except SQLException as e:
-                                self.log(Level.INFO, "Error: " + e.getMessage())
-                                
-                        # Fire off an event so UI updates and refreshes with the new artifacts
-                        IngestServices.getInstance().fireModuleDataEvent(ModuleDataEvent(ParseWindowsChromeIngestModuleFactory.moduleName, artIDHistEvt, None))
-                        #IngestServices.getInstance().fireModuleDataEvent(ModuleDataEvent(ParseWindowsChromeIngestModuleFactory.moduleName, BlackboardArtifact.ARTIFACT_TYPE.TSK_WEB_DOWNLOAD, None))
-                        
-                        # Query the downloads table in the History database for some of the columns
-                        history_query2 = "Select target_path, end_time, tab_url FROM downloads"
-                        self.log(Level.INFO, history_query2)
-                        resultSet2 = stmt.executeQuery(history_query2)
-                        self.log(Level.INFO, history_query2)
-                        self.log(Level.INFO, "Query downloads table")
-                        
-                        # Create the artifacts
-                        artName2 = "TSK_WEB_DOWNLOAD"
-                        artIDDownloads = skCase.getArtifactTypeID(artName2)
-                        artIDDownloadsEvt = skCase.getArtifactType(artName2)
-                        
-                        while resultSet2.next():
-                            try: 
-                                art2 = file.newArtifact(artIDDownloads)
-                                self.log(Level.INFO, "Inserting attribute target_path")
-                                art2.addAttribute(BlackboardAttribute(BlackboardAttribute.ATTRIBUTE_TYPE.TSK_PATH.getTypeID(), ParseWindowsChromeIngestModuleFactory.moduleName, resultSet2.getString("target_path")))
-                                self.log(Level.INFO, "Inserting attribute end_time")
-                                art2.addAttribute(BlackboardAttribute(BlackboardAttribute.ATTRIBUTE_TYPE.TSK_DATETIME_ACCESSED.getTypeID(), ParseWindowsChromeIngestModuleFactory.moduleName, resultSet2.getInt("end_time")))
-                                self.log(Level.INFO, "Inserting attribute tab_url")
-                                art2.addAttribute(BlackboardAttribute(BlackboardAttribute.ATTRIBUTE_TYPE.TSK_URL.getTypeID(), ParseWindowsChromeIngestModuleFactory.moduleName, resultSet2.getString("tab_url")))
-
-                            except SQLException as e:
-                                self.log(Level.INFO, "Error: " + e.getMessage())
-                                #return IngestModule.ProcessResult.OK
-                    
-                        # Fire off an event so UI updates and refreshes with the new artifacts
-                        IngestServices.getInstance().fireModuleDataEvent(ModuleDataEvent(ParseWindowsChromeIngestModuleFactory.moduleName, artIDDownloadsEvt, None))
-                        
-                        # Close database and remove the temp directory              
-                        stmt.close()
-                        dbConn.close()
-                        
-                                             
-            # Log message if an error occurred                
+                    self.EmitRecords(unit, reader, ReadJson(stream, reader, unit.mark(reader.table)), emit)
+                finally:
+                    stream.close()
+            return
+        if unit.kind == "cache":
+            # The index, block and entry files are read in place from the image
+            for reader in unit.pending(unit.readers):
+                folder = ImageCacheFolder(unit.file, unit.sidecars)
+                self.EmitRecords(unit, reader, ReadCache(folder, reader, unit.mark(reader.table)), emit)
+            return
+
+        # Deleted rows are carved from the copy and its WAL before the WAL is folded in,
+        # unless every recovered table of the database is already written
+        carvers = unit.pending(unit.carvers) if self.recover else []
+        carved = []
+        if carvers:
+            try:
+                with self.timer.phase("carve", unit.profile.label, unit.file.getName(), "records") as run:
+                    carved = CarveDatabase(lclDbPath, [reader.source for reader in carvers], self.context.isJobCancelled)
+                    run.count += len(carved)
             except Exception as e:
-                self.log(Level.INFO, "Error: " + e.getMessage())
-                
-        # Log message if an error occurred                
-        except:
-            self.log(Level.INFO, "An error occurred")
-                                             
-        
-    def ChromeTopSites(self, dataSource, progressBar):
-        
-        '''Parse and save Top Sites to SQL database, and 
-        import to the extract view section of Autopsy'''
+                # Not marked completed, recovery is tried again on the next run
+                carvers = []
+                self.Count("recovery errors: " + unit.file.getName())
+                self.log(Level.INFO, "Could not recover rows of " + unit.file.getUniquePath() + ": " + str(e))
+            # A carve stopped by cancellation is incomplete
+            if self.context.isJobCancelled():
+                raise JobCancelled()
 
+        # One connection per database, every table of the database is read over it
+        source = JdbcSource(lclDbPath)
         try:
-            # We don't know how much work there is yet
-            progressBar.switchToIndeterminate()
-            # Set the database to be read
-            
-            skCase = Case.getCurrentCase().getSleuthkitCase()
-            # self.log(Level.INFO, "Case dir: " + skCase.getCaseDirectory())
-            fileManager = Case.getCurrentCase().getServices().getFileManager()
+            # Up front estimate of the rows for the progress bar
+            expected = 0
+            for reader in unit.readers:
+                try:
+                    expected += EstimateRows(source, reader, unit.mark(reader.table))
+                except SQLException:
+                    pass
+            unit.expected = expected
 
-            try:
+            for reader in unit.readers:
+                try:
+                    self.EmitRecords(unit, reader, ReadTable(source, reader, unit.mark(reader.table)), emit)
+                except SQLException as e:
+                    # Tables and columns differ between browser versions, go on with the other tables
+                    self.Count("table errors: " + reader.table)
+                    self.log(Level.INFO, "Could not read " + reader.table + " of " + unit.file.getUniquePath() + ": " + e.getMessage())
+
+            # Recovered rows still present in the live tables are dropped
+            for reader in carvers:
+                try:
+                    self.EmitRecords(unit, reader, RecoveredRecords(source, reader, carved), emit)
+                except SQLException as e:
+                    self.Count("table errors: " + reader.table)
+                    self.log(Level.INFO, "Could not check " + reader.table + " of " + unit.file.getUniquePath() + ": " + e.getMessage())
+
+        # Close database, the pipeline removes the temp copy
+        finally:
+            source.close()
+
+    def ResolveTargets(self, unit, reader, records, targetIndex):
+        '''
+        Read all records of a download reader and find the files they were saved to in one
+        go, returns the records and the (file, MD5) of each record, None when not found
+        '''
+        with self.timer.phase("resolve", unit.profile.label, reader.table, "downloads") as run:
+            records = list(records)
+            files = self.targets.resolve([record[targetIndex] for record in records], unit.file)
+            for position, file in enumerate(files):
+                if file is None:
+                    continue
+                run.count += 1
                 try:
-                    files = fileManager.findFiles(dataSource, "Top Sites", "Users/%/AppData/Local/Google/Chrome/User Data/Default")
-                
+                    files[position] = (file, self.targets.md5(file))
+                except JobCancelled:
+                    raise
                 except Exception as e:
-                    self.log(Level.INFO, "Could not find Top Sites file" + e.getMessage())
-        
-                fileCount = 0
-                
-                # Create temp directory
-                tempDir = self.CreateTempDir()
-                self.log(Level.INFO, "tempDir: " + tempDir)
-                
-                # Write the Event Log file to temp directory 
-                for file in files:
-                    # Check if the user cancelled the module
-                    if self.context.isJobCancelled():
-                        return IngestModule.ProcessResult.OK
-                    
-                    fileCount += 1
-                    self.log(Level.INFO, "filename: " + file.getName())
-                    self.log(Level.INFO, "tempDir: " + tempDir)
-                    # Save the database to the temp directory
-                    lclDbPath = os.path.join(tempDir, file.getName())
-                    ContentUtils.writeToFile(file, File(lclDbPath))
-                  
-                
-                for file in files:
-                    if file.getName() == "Top Sites":
-                        # Check if OS is Windows otherwise stop
-                        if not PlatformUtil.isWindowsOS():
-                            self.log(Level.INFO, "Not running on Windows so stopping process")
-                            return IngestModule.ProcessResult.OK
-                            
-                        # Open the database using JDBC
-                        # Connect to database
-                        lclDbPath = os.path.join(Case.getCurrentCase().getTempDirectory(), "Top Sites")
-                        Class.forName("org.sqlite.JDBC").newInstance()
-                        dbConn = DriverManager.getConnection("jdbc:sqlite:%s"  % lclDbPath)    
-                    
-                        # Create the artifacts
-                        try:
-                            artID_ts = skCase.addArtifactType("TSK_CHROME_TOPSITES", "Chrome Top Sites")
-                        
-                        except:
-                            self.log(Level.INFO, "Attributes creation error: TSK_CHROME_TOPSITES")
-                        '''
-                        try: 
-                            # custom artifact for url_rank
-                            attID_url_rank = skCase.addArtifactAttributeType("TSK_URL_RANK", BlackboardAttribute.TSK_BLACKBOARD_ATTRIBUTE_TYPE.VALUE, "URL Rank")
-                        # Log message if error
-                        except:
-                            self.log(Level.INFO, "Attributes creation error: url_rank")
-                        '''
-                        # Get the artifacts and attributes
-                        artID_ts = skCase.getArtifactTypeID("TSK_CHROME_TOPSITES")
-                        artID_ts_evt = skCase.getArtifactType("TSK_CHROME_TOPSITES")
-                        
-                        # attID_url_rank = skCase.getAttributeType("TSK_URL_RANK")
-                        
-                        # Query the urls table in the History database for some of the columns
-                        stmt = dbConn.createStatement()
-                        topsites_query = "Select url, url_rank, title FROM top_sites"
-                        self.log(Level.INFO, topsites_query)
-                        resultSet3 = stmt.executeQuery(topsites_query)
-                        self.log(Level.INFO, topsites_query)
-                        self.log(Level.INFO, "Query Top Sites database")
-                        
-                        # Cycle through each row to create artifacts
-                        while resultSet3.next():
-                            try: 
-                                art3 = file.newArtifact(artID_ts)
-                                self.log(Level.INFO, "Inserting attribute url")
-                                art3.addAttribute(BlackboardAttribute(BlackboardAttribute.ATTRIBUTE_TYPE.TSK_URL.getTypeID(), ParseWindowsChromeIngestModuleFactory.moduleName, resultSet3.getString("url")))
-                                self.log(Level.INFO, "Inserting attribute url_rank")
-                                #art3.addAttribute(BlackboardAttribute(attID_url_rank, ParseWindowsChromeIngestModuleFactory.moduleName, resultSet3.getInt("url_rank")))
-                                art3.addAttribute(BlackboardAttribute(BlackboardAttribute.ATTRIBUTE_TYPE.TSK_VALUE.getTypeID(), ParseWindowsChromeIngestModuleFactory.moduleName, resultSet3.getString("url_rank")))
-                                self.log(Level.INFO, "Inserting attribute title")
-                                art3.addAttribute(BlackboardAttribute(BlackboardAttribute.ATTRIBUTE_TYPE.TSK_TITLE.getTypeID(), ParseWindowsChromeIngestModuleFactory.moduleName, resultSet3.getString("title")))
-                             
-                            except SQLException as e:
-                                self.log(Level.INFO, "Error: " + e.getMessage())
-                                return IngestModule.ProcessResult.OK                              
-          
-                        # Fire off an event so UI updates and refreshes with the new artifacts
-                        IngestServices.getInstance().fireModuleDataEvent(ModuleDataEvent(ParseWindowsChromeIngestModuleFactory.moduleName, artID_ts_evt, None))
-
-                        # Close database and remove the temp directory              
-                        stmt.close()
-                        dbConn.close()
-                                             
-            # Log message if an error occurred          
-            except Exception as e:
-                self.log(Level.INFO, "Error: " + e.getMessage())
-                
-        # Log message if an error occurred 
-        except:
-            self.log(Level.INFO, "An error occurred")
-            
-                
\ No newline at end of file
+                    self.Count("download hash errors")
+                    self.log(Level.FINE, "Could not hash " + file.getUniquePath() + ": " + str(e))
+                    files[position] = (file, None)
+        return records, files
+
+    def EmitRecords(self, unit, reader, records, emit):
+        '''Turn the records of one reader into artifact attributes and emit them'''
+        moduleName = ParseWindowsChromeIngestModuleFactory.moduleName
+        isCancelled = self.context.isJobCancelled
+        artType, attributes, targets = self.mappings[reader.table]
+        if targets is not None:
+            records, files = self.ResolveTargets(unit, reader, records, targets[0])
+        with self.timer.phase("query", unit.profile.label, reader.table) as run:
+            # Cycle through each row to collect the attributes of its artifact
+            for record in records:
+                run.count += 1
+                # emit checks at every chunk, this covers rows that are skipped
+                if run.count % CANCEL_CHECK_ROWS == 0 and isCancelled():
+                    raise JobCancelled()
+                try:
+                    values = [BlackboardAttribute(typeID, moduleName, convert(record[index]))
+                        for typeID, convert, index, optional in attributes if record[index] or not optional]
+                    if targets is not None and files[run.count - 1] is not None:
+                        file, md5 = files[run.count - 1]
+                        values.append(BlackboardAttribute(targets[1], moduleName, Long(file.getId())))
+                        values.append(BlackboardAttribute(targets[2], moduleName, Long(file.getSize())))
+                        if md5:
+                            values.append(BlackboardAttribute(targets[3], moduleName, md5))
+                except Exception as e:
+                    self.Count("row errors: " + reader.table)
+                    self.log(Level.FINE, "Error: " + str(e))
+                    continue
+                emit(reader.table, record[0], artType, values)
+        if reader.table in UNMARKED_TABLES:
+            # Marks the table completed once the rows before it are written
+            emit(reader.table, 0, None, None)
@@ -0,0 +1,552 @@
+'''
+@author: Saarthik Tannan
+@contact: saarthik@gmail.com
+'''
+# Host independent machinery of the Autopsy module: the profile index, watermarks,
+# the extraction pipeline, the parse worker pool, progress, phase timings and the
+# batched artifact writer. Everything Autopsy provides (file manager, files, progress
+# bar, case) is passed in, so this runs under Jython in Autopsy and under CPython
+# with stand-in objects, as the tests and benchmarks do.
+
+# This is free and unencumbered software released into the public domain.
+# See Windows_Chrome_Module.py for the full text of the license.
+
+import hashlib
+import json
+import os
+import threading
+import time
+try:
+    import Queue
+except ImportError:
+    import queue as Queue
+
+from Windows_Chrome_Core import USER_DATA_DIR, SplitUserDataPath
+
+
+# Files of one browser profile, keyed by their path relative to the profile directory
+class ChromeProfile(object):
+    def __init__(self, user, browser, name):
+        self.user = user
+        self.browser = browser
+        self.name = name
+        self.label = "%s/%s/%s" % (user, browser, name)
+        self.files = {}
+
+    def add(self, relPath, file):
+        self.files.setdefault(relPath, []).append(file)
+
+    def get(self, relPath):
+        return self.files.get(relPath, [])
+
+    def siblings(self, relPath):
+        '''(relative path, file) of every file in the directory of relPath and below it'''
+        folder = relPath.rpartition("/")[0] + "/"
+        found = []
+        for path in sorted(self.files):
+            if path.startswith(folder) and path != relPath:
+                for file in self.files[path]:
+                    found.append((path, file))
+        return found
+
+
+# Every profile of every Chromium based browser of a data source, built from a
+# single file manager query over all "User Data" trees and shared by the extractors
+class ProfileIndex(object):
+    def __init__(self):
+        self.profiles = {}
+        self.queries = 0
+
+    def build(self, fileManager, dataSource):
+        self.queries += 1
+        for file in fileManager.findFiles(dataSource, "%", "/" + USER_DATA_DIR + "/"):
+            if not file.isDir():
+                self.add(file)
+        return self
+
+    def add(self, file):
+        parts = SplitUserDataPath(file.getParentPath())
+        if parts is None:
+            return
+        user, browser, name, sub = parts
+        key = (user.lower(), browser.lower(), name.lower())
+        profile = self.profiles.get(key)
+        if profile is None:
+            profile = self.profiles[key] = ChromeProfile(user, browser, name)
+        profile.add(sub + file.getName(), file)
+
+    def findFiles(self, relPath):
+        '''(profile, file) pairs for relPath in every profile, in a stable order'''
+        found = []
+        for key in sorted(self.profiles):
+            profile = self.profiles[key]
+            for file in profile.get(relPath):
+                found.append((profile, file))
+        return found
+
+
+# Number of copied databases that may wait for a parser
+EXTRACTION_QUEUE_DEPTH = 2
+
+# One file of one profile together with its sidecar files and the registry entry
+# that reads it. marks holds the highest row ID per table already on the blackboard,
+# completed the tables without row IDs that are already on it in full.
+class DatabaseUnit(object):
+    def __init__(self, profile, file, sidecars, extractor):
+        self.profile = profile
+        self.file = file
+        self.sidecars = sidecars
+        self.kind = extractor.kind
+        self.readers = extractor.readers
+        self.carvers = extractor.carvers
+        self.marks = {}
+        self.completed = set()
+        self.fingerprint = None
+        self.failed = False
+        # Progress weight (KiB of the file and its sidecars) and the rows estimated and written
+        self.weight = max(1, sum([content.getSize() for content in [file] + list(sidecars)]) // 1024)
+        self.expected = 0
+        self.written = 0
+
+    def mark(self, table):
+        return self.marks.get(table, 0)
+
+    def pending(self, readers):
+        '''The readers whose table is not completed yet'''
+        return [reader for reader in readers if reader.table not in self.completed]
+
+
+def WatermarkPath(moduleDir, dataSourceId):
+    '''Watermark file of one data source in the case module directory'''
+    return os.path.join(moduleDir, "watermarks-%d.json" % dataSourceId)
+
+
+# Highest row ID parsed from each table of every database, kept in the case module
+# directory. A database whose fingerprint is unchanged is skipped, a changed one is
+# only read above its watermarks so re-running ingest does not duplicate artifacts.
+# Each data source has its own file (see WatermarkPath): a job loads it when it starts
+# and overwrites it when it ends, jobs running at once on other data sources keep theirs.
+class WatermarkStore(object):
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        try:
+            with open(path) as stored:
+                self.entries = json.load(stored)
+        except (IOError, ValueError):
+            pass
+
+    def fingerprint(self, unit):
+        '''
+        Digest of the size, mtime and crtime of the database and its sidecars, a cache
+        directory has thousands of sidecars. The MD5 is left out: it is only set once the
+        hash module has run, which would change the fingerprint of an unchanged file.
+        '''
+        parts = []
+        for content in [unit.file] + list(unit.sidecars):
+            parts.append("%s:%d:%d:%d" % (content.getName(), content.getSize(), content.getMtime(), content.getCrtime()))
+        return hashlib.md5("|".join(parts).encode("utf-8")).hexdigest()
+
+    def prepare(self, unit):
+        '''Load the watermarks of unit, returns False when it is unchanged since the last run'''
+        unit.fingerprint = self.fingerprint(unit)
+        entry = self.entries.get(str(unit.file.getId()))
+        if entry is None:
+            return True
+        if entry.get("fingerprint") == unit.fingerprint:
+            return False
+        unit.marks = dict(entry.get("marks", {}))
+        unit.completed = set(entry.get("completed", []))
+        return True
+
+    def update(self, unit, complete):
+        '''Record the watermarks written for unit, the fingerprint only once all of it is written'''
+        entry = self.entries.setdefault(str(unit.file.getId()), {})
+        entry["marks"] = dict(unit.marks)
+        entry["completed"] = sorted(unit.completed)
+        if complete:
+            entry["fingerprint"] = unit.fingerprint
+
+    def save(self):
+        folder = os.path.dirname(self.path)
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+        with open(self.path, "w") as stored:
+            json.dump(self.entries, stored)
+
+
+# Producer/consumer pipeline: a background thread copies the next databases while
+# the consumers parse the current ones. Consumers release each copy once parsed.
+class ExtractionPipeline(object):
+    _DONE = object()
+
+    def __init__(self, extractor, units, isCancelled, depth=EXTRACTION_QUEUE_DEPTH):
+        self.extractor = extractor
+        self.units = units
+        self.isCancelled = isCancelled
+        self.queue = Queue.Queue(depth)
+        self.stopped = False
+
+    def produce(self):
+        try:
+            for unit in self.units:
+                if self.stopped or self.isCancelled():
+                    break
+                try:
+                    self.queue.put((unit, self.extractor.extract(unit), None))
+                except Exception as e:
+                    self.queue.put((unit, None, e))
+        finally:
+            self.queue.put(self._DONE)
+
+    def release(self, path):
+        '''Remove the temp copy of a database that has been parsed'''
+        if path is not None:
+            self.extractor.remove(path)
+
+    def __iter__(self):
+        producer = threading.Thread(target=self.produce, name="Chrome temp extraction")
+        producer.daemon = True
+        producer.start()
+        try:
+            while True:
+                item = self.queue.get()
+                if item is self._DONE:
+                    break
+                yield item
+        finally:
+            # Unblock and drain the producer if the consumers stopped early
+            self.stopped = True
+            while producer.is_alive() or not self.queue.empty():
+                try:
+                    item = self.queue.get(True, 0.1)
+                except Queue.Empty:
+                    continue
+                if item is not self._DONE:
+                    self.release(item[1])
+
+
+# Number of threads parsing databases, the blackboard is only written from the ingest thread
+WORKER_THREADS = 4
+
+# Number of row chunks a parser may queue ahead of the blackboard writer
+ROW_QUEUE_DEPTH = 4
+
+
+# Raised inside a parser to stop it when the ingest job is cancelled
+class JobCancelled(Exception):
+    pass
+
+
+# Parses the databases of an ExtractionPipeline on a bounded pool of threads. The
+# rows are handed to the calling thread in database order and in chunks, so a single
+# thread writes the blackboard and the output does not depend on the number of threads.
+class ParseWorkerPool(object):
+    _DONE = object()
+
+    def __init__(self, threads, chunkSize, isCancelled):
+        self.threads = max(1, int(threads))
+        self.chunkSize = max(1, int(chunkSize))
+        self.isCancelled = isCancelled
+        self.stopped = False
+
+    def put(self, queue, item):
+        '''Blocking put that gives up once the pool is stopped, returns False then'''
+        while not self.stopped:
+            try:
+                queue.put(item, True, 0.2)
+                return True
+            except Queue.Full:
+                pass
+        return False
+
+    def get(self, queue):
+        '''Blocking get that gives up once the job is cancelled, returns None then'''
+        while not self.isCancelled():
+            try:
+                return queue.get(True, 0.2)
+            except Queue.Empty:
+                pass
+        return None
+
+    def run(self, pipeline, parse, write, fail, finish):
+        '''
+        parse(unit, path, emit) runs on a worker and calls emit(table, rowId, artType, attributes)
+        for every row. write(unit, rows), fail(unit, error) and finish(unit) run on the calling thread.
+        '''
+        source = iter(pipeline)
+        sourceLock = threading.Lock()
+        slots = Queue.Queue()
+        running = [self.threads]
+
+        def work():
+            try:
+                while not self.stopped:
+                    # Units are taken and their slots queued under one lock so the
+                    # slots are in unit order
+                    with sourceLock:
+                        try:
+                            unit, path, error = next(source)
+                        except StopIteration:
+                            return
+                        rows = Queue.Queue(ROW_QUEUE_DEPTH)
+                        slots.put((unit, rows))
+                    try:
+                        if self.stopped:
+                            pass
+                        elif error is None:
+                            self.parse(parse, unit, path, rows)
+                        else:
+                            self.put(rows, (None, error))
+                    except Exception as e:
+                        self.put(rows, (None, e))
+                    finally:
+                        pipeline.release(path)
+                        self.put(rows, self._DONE)
+            finally:
+                with sourceLock:
+                    running[0] -= 1
+                    if running[0] == 0:
+                        slots.put(self._DONE)
+
+        workers = []
+        for index in range(self.threads):
+            worker = threading.Thread(target=work, name="Chrome parser %d" % index)
+            worker.daemon = True
+            workers.append(worker)
+            worker.start()
+
+        try:
+            # Waits time out so a cancelled job is noticed while a parser is between chunks
+            slot = self.get(slots)
+            while slot is not None and slot is not self._DONE:
+                unit, rows = slot
+                item = self.get(rows)
+                while item is not None and item is not self._DONE:
+                    chunk, error = item
+                    if error is not None:
+                        fail(unit, error)
+                    else:
+                        write(unit, chunk)
+                    item = self.get(rows)
+                if item is None:
+                    break
+                finish(unit)
+                slot = self.get(slots)
+        finally:
+            self.stopped = True
+            for worker in workers:
+                worker.join()
+            with sourceLock:
+                source.close()
+
+    def parse(self, parse, unit, path, rows):
+        chunk = []
+
+        def emit(table, rowId, artType, attributes):
+            chunk.append((table, rowId, artType, attributes))
+            if len(chunk) >= self.chunkSize:
+                if self.isCancelled() or not self.put(rows, (list(chunk), None)):
+                    raise JobCancelled()
+                del chunk[:]
+
+        try:
+            parse(unit, path, emit)
+        except JobCancelled as e:
+            self.put(rows, (None, e))
+            return
+        if chunk:
+            self.put(rows, (chunk, None))
+
+
+# Seconds between two updates of the progress bar
+PROGRESS_INTERVAL = 0.5
+
+# Rows between two cancellation checks in the row loops
+CANCEL_CHECK_ROWS = 1000
+
+
+# Drives a determinate progress bar from the ingest thread. Every database weighs its
+# size in KiB, known before anything is copied, and its share advances with the rows
+# written against the rows its parser estimated once the copy was opened.
+class ProgressTracker(object):
+    def __init__(self, progressBar, units, interval=PROGRESS_INTERVAL):
+        self.progressBar = progressBar
+        self.interval = interval
+        self.completed = 0
+        self.current = None
+        self.updated = 0.0
+        total = 0
+        for unit in units:
+            total += unit.weight
+        self.progressBar.switchToDeterminate(max(1, total))
+
+    def advance(self, unit, rows):
+        unit.written += rows
+        if unit is not self.current:
+            self.current = unit
+            self.update(True)
+        else:
+            self.update(False)
+
+    def finish(self, unit):
+        self.completed += unit.weight
+        self.current = None
+        self.update(True)
+
+    def update(self, force):
+        now = time.time()
+        if not force and now - self.updated < self.interval:
+            return
+        self.updated = now
+        value = self.completed
+        unit = self.current
+        if unit is not None:
+            if unit.expected > 0:
+                value += int(unit.weight * min(1.0, float(unit.written) / unit.expected))
+            self.progressBar.progress(unit.profile.label + " " + unit.file.getName(), value)
+        else:
+            self.progressBar.progress(value)
+
+
+# Number of rows collected before artifacts are written to the case database
+ARTIFACT_CHUNK_SIZE = 500
+
+
+# Records wall time and item counts for each phase (copy, query, artifacts, events)
+# of each profile and table. Nested phases are subtracted from the enclosing one of
+# the same thread so a chunk written from inside a row loop is not also counted as query time.
+class PhaseTimer(object):
+    def __init__(self):
+        self.totals = {}
+        self.order = []
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def stack(self):
+        if not hasattr(self.local, "stack"):
+            self.local.stack = []
+        return self.local.stack
+
+    def phase(self, phase, profile, table, unit="rows"):
+        '''Context manager timing one phase, items are counted with .count += n'''
+        return _PhaseRun(self, (phase, profile, table, unit))
+
+    def record(self, key, seconds, count):
+        with self.lock:
+            if key not in self.totals:
+                self.totals[key] = [0.0, 0]
+                self.order.append(key)
+            total = self.totals[key]
+            total[0] += seconds
+            total[1] += count
+
+    def summary(self):
+        '''One line per phase, in the order the phases were first seen'''
+        lines = []
+        for key in self.order:
+            seconds, count = self.totals[key]
+            phase, profile, table, unit = key
+            rate = count / seconds if seconds > 0 else 0.0
+            lines.append("%s %s [%s]: %d %s in %.2fs (%.0f %s/s)" % (phase, profile, table, count, unit, seconds, rate, unit))
+        return lines
+
+
+class _PhaseRun(object):
+    def __init__(self, timer, key):
+        self.timer = timer
+        self.key = key
+        self.count = 0
+        self.started = 0.0
+        self.nested = 0.0
+
+    def __enter__(self):
+        self.started = time.time()
+        self.timer.stack().append(self)
+        return self
+
+    def __exit__(self, excType, excValue, tb):
+        elapsed = time.time() - self.started
+        stack = self.timer.stack()
+        stack.pop()
+        if stack:
+            stack[-1].nested += elapsed
+        self.timer.record(self.key, elapsed - self.nested, self.count)
+        return False
+
+
+# Collects the attribute list of each row and writes the artifacts in chunks. Every
+# artifact of a chunk is created with its attributes in one case database transaction
+# (Blackboard.newDataArtifact, TSK 4.11 and later) and the chunk is posted once committed.
+# What must only happen once rows are in the case, like advancing their watermarks,
+# waits in after() for the commit of the chunk holding them, and never runs once a
+# chunk failed.
+class ArtifactBatchWriter(object):
+    def __init__(self, skCase, moduleName, chunkSize=ARTIFACT_CHUNK_SIZE, timer=None):
+        self.skCase = skCase
+        self.blackboard = skCase.getBlackboard()
+        self.moduleName = moduleName
+        self.chunkSize = max(1, int(chunkSize))
+        self.timer = timer or PhaseTimer()
+        self.profile = ""
+        self.table = ""
+        self.pending = []
+        self.callbacks = []
+        self.failed = False
+        self.artifactCount = 0
+        self.chunkCount = 0
+
+    def begin(self, profile, table):
+        '''Flush what is queued and attribute the following rows to profile and table'''
+        self.flush()
+        self.profile = profile
+        self.table = table
+
+    def add(self, content, artType, attributes):
+        '''Queue one artifact of artType on content with its list of attributes'''
+        self.pending.append((content, artType, attributes))
+        if len(self.pending) >= self.chunkSize:
+            self.flush()
+
+    def after(self, callback):
+        '''Call callback once every artifact queued so far is committed'''
+        if self.failed:
+            return
+        if self.pending:
+            self.callbacks.append(callback)
+        else:
+            callback()
+
+    def flush(self):
+        '''Write the queued artifacts in one transaction, then post them for the UI and keyword search'''
+        if not self.pending:
+            return
+        rows = self.pending
+        callbacks = self.callbacks
+        self.pending = []
+        self.callbacks = []
+
+        artifacts = []
+        with self.timer.phase("artifacts", self.profile, self.table) as run:
+            # The artifact rows and their attributes go through the transaction's own
+            # connection, nothing of the chunk is written outside of it
+            trans = self.skCase.beginTransaction()
+            try:
+                for content, artType, attributes in rows:
+                    artifacts.append(self.blackboard.newDataArtifact(artType, content.getId(),
+                        content.getDataSourceObjectId(), attributes, None, trans))
+                trans.commit()
+            except:
+                trans.rollback()
+                self.failed = True
+                raise
+            run.count = len(rows)
+
+        self.chunkCount += 1
+        self.artifactCount += len(rows)
+        for callback in callbacks:
+            callback()
+        with self.timer.phase("events", self.profile, self.table, "events") as run:
+            # One post per chunk, the blackboard fires one event per artifact type
+            self.blackboard.postArtifacts(artifacts, self.moduleName)
+            run.count += 1
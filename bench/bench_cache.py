@@ -0,0 +1,48 @@
+'''
+Entries per second and peak Python heap of reading synthetic blockfile and Simple caches.
+
+    python bench/bench_cache.py [--entries 20000] [--body 16384]
+'''
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests"))
+
+from fixtures import CreateBlockfileCache, CreateSimpleCache
+from Windows_Chrome_Core import CACHE, ReadCache
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=20000)
+    parser.add_argument("--body", type=int, default=16384, help="body bytes of every entry")
+    args = parser.parse_args()
+    folder = tempfile.mkdtemp()
+    try:
+        for name, create in (("blockfile", CreateBlockfileCache), ("simple", CreateSimpleCache)):
+            cache = create(os.path.join(folder, name), args.entries, args.body)
+            started = time.time()
+            count = 0
+            for record in ReadCache(cache, CACHE):
+                count += 1
+            elapsed = time.time() - started
+            # A second, traced pass for the heap, the fixture builder holds whole files in memory
+            tracemalloc.start()
+            for record in ReadCache(cache, CACHE):
+                pass
+            peak = tracemalloc.get_traced_memory()[1] / (1024.0 * 1024.0)
+            tracemalloc.stop()
+            print("%-9s %8d entries  %7.2fs  %9.0f entries/s  heap peak %6.2f MiB" % (name, count, elapsed,
+                count / elapsed, peak))
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+'''
+Carving throughput of synthetic History databases with part of their rows deleted,
+with and without secure_delete, in MB of database per second and rows recovered.
+
+    python bench/bench_carve.py [--urls 40000] [--visits 2] [--deleted 0.5]
+'''
+
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests"))
+
+from fixtures import CreateHistory
+from Windows_Chrome_Carver import CarveDatabase
+
+TABLES = ["urls", "visits", "downloads"]
+
+
+def DeleteRows(path, fraction, secure):
+    '''Delete every row whose ID falls in the first fraction of each run of 100 IDs'''
+    db = sqlite3.connect(path)
+    db.execute("PRAGMA secure_delete=%s" % ("ON" if secure else "OFF"))
+    for table in TABLES:
+        db.execute("DELETE FROM %s WHERE id %% 100 < ?" % table, (int(fraction * 100),))
+    db.commit()
+    db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--urls", type=int, default=40000)
+    parser.add_argument("--visits", type=int, default=2, help="visits per url")
+    parser.add_argument("--deleted", type=float, default=0.5, help="fraction of the rows deleted")
+    args = parser.parse_args()
+    folder = tempfile.mkdtemp()
+    try:
+        for secure in (False, True):
+            path = CreateHistory(os.path.join(folder, "History_%d" % secure), args.urls, args.visits, downloads=100)
+            DeleteRows(path, args.deleted, secure)
+            size = os.path.getsize(path) / (1024.0 * 1024.0)
+            started = time.time()
+            carved = CarveDatabase(path, TABLES)
+            elapsed = time.time() - started
+            counts = dict((table, 0) for table in TABLES)
+            for table, rowid, row in carved:
+                counts[table] += 1
+            print("secure_delete %-3s %7.1f MB  %6.2fs  %7.1f MB/s  recovered %s" % ("ON" if secure else "OFF",
+                size, elapsed, size / elapsed, ", ".join(["%s %d" % (table, counts[table]) for table in TABLES])))
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+'''
+Cost of the host, domain and search terms enrichment of history urls and visits: rows
+per second over a synthetic History with and without it, for ReadTable alone and for
+ReadTable with the attribute conversion of every row (RecordRows of the batch parser)
+and for the whole batch parser path, the rows written to its SQLite output.
+
+    python bench/bench_enrich.py [--rows 200000] [--visits 4] [--hosts 3000] [--repeat 5]
+'''
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import namedtuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests"))
+
+from fixtures import CreateHistory
+from Windows_Chrome_Core import EXTRACTORS, URLS, VISITS, TableReader, ReadTable, SqliteSource
+from Windows_Chrome_Batch import ROW_CHUNK, BatchTask, RecordRows, SqliteWriter
+
+ENRICHED_FIELDS = ("host", "domain", "search_terms")
+
+
+def Plain(reader):
+    '''The reader without the enrich field and its attributes, the records end before host'''
+    fields = [field for field in reader.record._fields if field not in ENRICHED_FIELDS]
+    return TableReader(reader.table, reader.query, reader.types, namedtuple("Plain" + reader.record.__name__, fields),
+        reader.artifact, tuple([attribute for attribute in reader.attributes if attribute[1] not in ENRICHED_FIELDS]))
+
+
+# (name, enriched readers, the same readers without enrichment)
+READS = (
+    ("urls", [URLS], [Plain(URLS)]),
+    ("visits", [VISITS], [Plain(VISITS)]),
+    ("History", [URLS, VISITS], [Plain(URLS), Plain(VISITS)]))
+
+
+def Read(source, reader):
+    return ReadTable(source, reader)
+
+
+def Rows(source, reader):
+    return RecordRows(reader, ReadTable(source, reader))
+
+
+def Written(source, reader, folder):
+    '''Rows of a reader written in ROW_CHUNK chunks to a new output of the batch parser, one at a time'''
+    path = os.path.join(folder, "output.sqlite")
+    if os.path.exists(path):
+        os.remove(path)
+    writer = SqliteWriter(path)
+    task = BatchTask("bench", "bob", "Google/Chrome", "Default", "History", None, EXTRACTORS[0])
+    chunk = []
+    try:
+        for row in RecordRows(reader, ReadTable(source, reader)):
+            chunk.append(row)
+            if len(chunk) >= ROW_CHUNK:
+                writer.write(task, chunk)
+                for written in chunk:
+                    yield written
+                chunk = []
+        writer.write(task, chunk)
+        for written in chunk:
+            yield written
+    finally:
+        writer.close()
+
+
+def Timed(source, readers, rows):
+    '''Seconds one full read takes and the rows read'''
+    started = time.time()
+    count = 0
+    for reader in readers:
+        for record in rows(source, reader):
+            count += 1
+    return time.time() - started, count
+
+
+def Best(source, plainReaders, enrichedReaders, repeat, rows):
+    '''
+    Fastest of repeat full reads without and with enrichment, in seconds, and the rows
+    read. The two alternate so that a slow spell of the machine slows both.
+    '''
+    plain = enriched = None
+    for attempt in range(repeat):
+        elapsed, count = Timed(source, plainReaders, rows)
+        plain = elapsed if plain is None else min(plain, elapsed)
+        elapsed, count = Timed(source, enrichedReaders, rows)
+        enriched = elapsed if enriched is None else min(enriched, elapsed)
+    return plain, enriched, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200000, help="urls rows")
+    parser.add_argument("--visits", type=int, default=4, help="visits per url")
+    parser.add_argument("--hosts", type=int, default=3000, help="distinct hosts the urls are spread over")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    folder = tempfile.mkdtemp()
+    try:
+        source = SqliteSource(CreateHistory(os.path.join(folder, "History"), args.rows, args.visits, hosts=args.hosts))
+        for table, enrichedReaders, plainReaders in READS:
+            write = lambda source, reader: Written(source, reader, folder)
+            for name, rows in (("ReadTable", Read), ("ReadTable + RecordRows", Rows), ("written", write)):
+                plain, enriched, count = Best(source, plainReaders, enrichedReaders, args.repeat, rows)
+                print("%-7s %-22s %8d rows: plain %7.0f rows/s, enriched %7.0f rows/s, %+6.1f%% per row" % (table,
+                    name, count, count / plain, count / enriched, (enriched / plain - 1) * 100))
+        source.close()
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+'''
+Throughput and peak memory of parsing synthetic History and Top Sites databases
+through the worker pool and the batched artifact writer, on a stand-in case.
+
+    python bench/bench_history.py [--sizes 10000,100000,1000000,5000000] [--threads 4]
+
+Every size runs in its own process so the peak memory of one does not hide the next.
+'''
+
+import argparse
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests"))
+
+from fixtures import CreateHistory, CreateTopSites, FakeCase, FakeFile
+from Windows_Chrome_Core import EXTRACTORS, ReadTable, AttributeValues, SqliteSource
+from Windows_Chrome_Pipeline import ChromeProfile, DatabaseUnit, ExtractionPipeline, ParseWorkerPool
+from Windows_Chrome_Pipeline import ArtifactBatchWriter, ARTIFACT_CHUNK_SIZE, WORKER_THREADS
+
+DEFAULT_SIZES = "10000,100000,1000000"
+
+
+# The databases are parsed in place, the benchmark measures parsing and writing
+class InPlaceExtractor(object):
+    def extract(self, unit):
+        return unit.file.local
+
+    def remove(self, path):
+        pass
+
+
+def ParseRows(unit, path, emit):
+    source = SqliteSource(path)
+    try:
+        for reader in unit.readers:
+            for record in ReadTable(source, reader):
+                emit(reader.table, record[0], reader.artifact, AttributeValues(reader, record))
+    finally:
+        source.close()
+
+
+def PeakMemoryMiB():
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0
+
+
+def RunSize(rows, threads):
+    '''Parse rows rows, half urls and visits of History and half Top Sites, print one result line'''
+    folder = tempfile.mkdtemp()
+    try:
+        urls = max(1, rows // 6)
+        history = CreateHistory(os.path.join(folder, "History"), urls, 2)
+        topSites = CreateTopSites(os.path.join(folder, "Top Sites"), rows - urls * 3)
+        units = []
+        for path, extractor in ((history, EXTRACTORS[0]), (topSites, EXTRACTORS[1])):
+            file = FakeFile("/Users/bob/AppData/Local/Google/Chrome/User Data/Default/", os.path.basename(path), local=path)
+            units.append(DatabaseUnit(ChromeProfile("bob", "Google/Chrome", "Default"), file, [], extractor))
+        case = FakeCase(keep=False)
+        writer = ArtifactBatchWriter(case, "Chrome", ARTIFACT_CHUNK_SIZE)
+
+        def write(unit, chunk):
+            for table, rowId, artType, attributes in chunk:
+                writer.add(unit.file, artType, attributes)
+
+        def fail(unit, error):
+            raise error
+
+        started = time.time()
+        pool = ParseWorkerPool(threads, ARTIFACT_CHUNK_SIZE, lambda: False)
+        pool.run(ExtractionPipeline(InPlaceExtractor(), units, lambda: False), ParseRows, write, fail,
+            lambda unit: writer.flush())
+        elapsed = time.time() - started
+        print("%9d rows  %7.2fs  %9.0f rows/s  peak %7.1f MiB" % (writer.artifactCount, elapsed,
+            writer.artifactCount / elapsed, PeakMemoryMiB()))
+    finally:
+        shutil.rmtree(folder)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma separated row counts, up to 5000000")
+    parser.add_argument("--threads", type=int, default=WORKER_THREADS)
+    parser.add_argument("--single", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.single:
+        RunSize(args.single, args.threads)
+        return
+    for size in [int(size) for size in args.sizes.split(",")]:
+        subprocess.check_call([sys.executable, os.path.abspath(__file__), "--single", str(size),
+            "--threads", str(args.threads)])
+
+
+if __name__ == "__main__":
+    main()
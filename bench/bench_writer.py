@@ -0,0 +1,74 @@
+'''
+Rows per second of writing artifacts one at a time, as the module did before
+ArtifactBatchWriter (newArtifact, one addAttribute per attribute and a post per row,
+each its own case database round trip), against the batched writer, on a stand-in
+case that sleeps for every round trip.
+
+    python bench/bench_writer.py [--rows 20000] [--latency 0.0002]
+'''
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests"))
+
+from fixtures import FakeCase, FakeFile
+from Windows_Chrome_Pipeline import ArtifactBatchWriter, ARTIFACT_CHUNK_SIZE
+
+ATTRIBUTES = ["url", "title", "visit count", "accessed", "domain", "host", "search terms"]
+
+
+# Stand-in case where every round trip costs latency seconds
+class LatencyCase(FakeCase):
+    def __init__(self, latency):
+        self.latency = latency
+        self.trips = 0
+        FakeCase.__init__(self, keep=False)
+
+    @property
+    def roundTrips(self):
+        return self.trips
+
+    @roundTrips.setter
+    def roundTrips(self, value):
+        if value > self.trips:
+            time.sleep(self.latency * (value - self.trips))
+        self.trips = value
+
+
+def Before(case, content, rows):
+    blackboard = case.getBlackboard()
+    for index in range(rows):
+        artifact = blackboard.newDataArtifact("TSK_WEB_HISTORY", content.getId(), content.getDataSourceObjectId(), [], None, None)
+        for attribute in ATTRIBUTES:
+            artifact.attributes.append(attribute)
+            case.roundTrips += 1
+        blackboard.postArtifacts([artifact], "Chrome")
+
+
+def After(case, content, rows):
+    writer = ArtifactBatchWriter(case, "Chrome", ARTIFACT_CHUNK_SIZE)
+    for index in range(rows):
+        writer.add(content, "TSK_WEB_HISTORY", list(ATTRIBUTES))
+    writer.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--latency", type=float, default=0.0002, help="seconds per round trip")
+    args = parser.parse_args()
+    content = FakeFile("/Users/bob/", "History", 10)
+    for name, write in (("before", Before), ("after", After)):
+        case = LatencyCase(args.latency)
+        started = time.time()
+        write(case, content, args.rows)
+        elapsed = time.time() - started
+        print("%-6s %8d rows  %7.2fs  %9.0f rows/s  %8d round trips" % (name, args.rows, elapsed,
+            args.rows / elapsed, case.roundTrips))
+
+
+if __name__ == "__main__":
+    main()
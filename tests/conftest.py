@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The tests import the parser modules and the shared fixtures by their file names
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import fixtures  # noqa: E402,F401  (puts Windows_Chrome_Parser on sys.path)
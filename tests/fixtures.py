@@ -0,0 +1,349 @@
+'''
+Synthetic Chrome data and stand-ins for the Autopsy objects the parser is handed,
+shared by the tests and the benchmarks. Nothing in here needs Autopsy or Jython.
+'''
+
+import os
+import sqlite3
+import struct
+import sys
+
+PARSER_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Windows_Chrome_Parser")
+if PARSER_DIR not in sys.path:
+    sys.path.insert(0, PARSER_DIR)
+
+from Windows_Chrome_Core import WEBKIT_EPOCH_OFFSET
+from Windows_Chrome_Cache import BLOCKFILE_INDEX_MAGIC, BLOCKFILE_HEADER_SIZE, BLOCKFILE_INDEX_HEADER_SIZE
+from Windows_Chrome_Cache import BLOCKFILE_DEFAULT_TABLE_LEN, BLOCK_SIZES
+from Windows_Chrome_Cache import SIMPLE_INITIAL_MAGIC, SIMPLE_FINAL_MAGIC, SIMPLE_INDEX_MAGIC
+
+
+# 2023-11-14 as a WebKit timestamp, the base of every synthetic time
+WEBKIT_NOW = (1700000000 + WEBKIT_EPOCH_OFFSET) * 1000000
+
+URLS_SCHEMA = ("CREATE TABLE urls(id INTEGER PRIMARY KEY AUTOINCREMENT, url LONGVARCHAR, title LONGVARCHAR,"
+    " visit_count INTEGER DEFAULT 0 NOT NULL, typed_count INTEGER DEFAULT 0 NOT NULL,"
+    " last_visit_time INTEGER NOT NULL, hidden INTEGER DEFAULT 0 NOT NULL)")
+VISITS_SCHEMA = ("CREATE TABLE visits(id INTEGER PRIMARY KEY AUTOINCREMENT, url INTEGER NOT NULL,"
+    " visit_time INTEGER NOT NULL, from_visit INTEGER, transition INTEGER DEFAULT 0 NOT NULL,"
+    " segment_id INTEGER, visit_duration INTEGER DEFAULT 0 NOT NULL)")
+DOWNLOADS_SCHEMA = ("CREATE TABLE downloads(id INTEGER PRIMARY KEY, guid VARCHAR NOT NULL,"
+    " current_path LONGVARCHAR NOT NULL, target_path LONGVARCHAR NOT NULL, start_time INTEGER NOT NULL,"
+    " received_bytes INTEGER NOT NULL, total_bytes INTEGER NOT NULL, end_time INTEGER NOT NULL,"
+    " tab_url VARCHAR NOT NULL, mime_type VARCHAR(255) NOT NULL)")
+TOP_SITES_SCHEMA = "CREATE TABLE top_sites(url LONGVARCHAR NOT NULL PRIMARY KEY, url_rank INTEGER NOT NULL, title LONGVARCHAR NOT NULL)"
+
+# Hosts the synthetic urls are spread over, every tenth url is a search
+HOSTS = 3000
+
+
+def SyntheticUrl(index, hosts=HOSTS):
+    host = index % hosts
+    if index % 10 == 0:
+        return "https://www.google.com/search?q=term+%d&oq=term" % index
+    return "https://www.site%d.example/page/%d?ref=%d" % (host, index, index % 7)
+
+
+def _fastDatabase(path):
+    if os.path.exists(path):
+        os.remove(path)
+    db = sqlite3.connect(path)
+    db.execute("PRAGMA journal_mode=OFF")
+    db.execute("PRAGMA synchronous=OFF")
+    return db
+
+
+def CreateHistory(path, urls, visitsPerUrl=2, downloads=0, hosts=HOSTS):
+    '''A History database with urls rows, visitsPerUrl visits per url and some downloads'''
+    db = _fastDatabase(path)
+    for schema in (URLS_SCHEMA, VISITS_SCHEMA, DOWNLOADS_SCHEMA):
+        db.execute(schema)
+    db.executemany("INSERT INTO urls VALUES (?, ?, ?, ?, 0, ?, 0)",
+        ((index, SyntheticUrl(index, hosts), "Title %d" % index, visitsPerUrl, WEBKIT_NOW + index * 1000000)
+            for index in range(1, urls + 1)))
+
+    def visits():
+        visitId = 0
+        for index in range(1, urls + 1):
+            for visit in range(visitsPerUrl):
+                visitId += 1
+                yield (visitId, index, WEBKIT_NOW + index * 1000000 + visit, visitId - 1 if visit else 0, 0x30000001 if visit else 1)
+    db.executemany("INSERT INTO visits VALUES (?, ?, ?, ?, ?, 0, 0)", visits())
+    db.executemany("INSERT INTO downloads VALUES (?, ?, ?, ?, ?, 100, 100, ?, ?, 'application/octet-stream')",
+        ((index, "guid-%d" % index, "C:\\Users\\Bob\\Downloads\\file%d.crdownload" % index,
+            "C:\\Users\\Bob\\Downloads\\file%d.exe" % index, WEBKIT_NOW + index, WEBKIT_NOW + index + 5,
+            "https://files.example/%d" % index) for index in range(1, downloads + 1)))
+    db.commit()
+    db.close()
+    return path
+
+
+def CreateTopSites(path, sites):
+    '''A Top Sites database with sites rows'''
+    db = _fastDatabase(path)
+    db.execute(TOP_SITES_SCHEMA)
+    db.executemany("INSERT INTO top_sites VALUES (?, ?, ?)",
+        (("https://top%d.example/" % index, index, "Top %d" % index) for index in range(sites)))
+    db.commit()
+    db.close()
+    return path
+
+
+def _cacheAddress(fileType, fileNumber, start, blocks=1):
+    return 0x80000000 | (fileType << 28) | ((blocks - 1) << 24) | (fileNumber << 16) | start
+
+
+# Block files of a synthetic blockfile cache. Each file holds at most 0xFFFF blocks of
+# one size, full files continue in new data_N files like Chrome's own.
+class _BlockFiles(object):
+    def __init__(self):
+        self.files = {}
+        self.current = {1: 0, 2: 1, 3: 2}
+        self.next = 4
+
+    def allocate(self, fileType, blocks=1):
+        '''(cache address, file bytes, offset) of blocks new blocks of fileType'''
+        number = self.current[fileType]
+        size = BLOCK_SIZES[fileType]
+        data = self.files.setdefault(number, bytearray(BLOCKFILE_HEADER_SIZE))
+        start = (len(data) - BLOCKFILE_HEADER_SIZE) // size
+        if start + blocks > 0xFFFF:
+            number = self.current[fileType] = self.next
+            self.next += 1
+            data = self.files[number] = bytearray(BLOCKFILE_HEADER_SIZE)
+            start = 0
+        offset = len(data)
+        data.extend(b"\x00" * (size * blocks))
+        return _cacheAddress(fileType, number, start, blocks), data, offset
+
+
+def CacheKey(index):
+    return "1/0/_dk_https://a.example https://a.example https://a.example/asset/%d.js" % index
+
+
+def ResponseInfo(index):
+    return b"\x00" * 20 + b"HTTP/1.1 200 OK\x00Content-Type: text/javascript\x00X-Index: " + str(index).encode() + b"\x00\x00"
+
+
+def CreateBlockfileCache(folder, entries, bodySize=512):
+    '''
+    A blockfile cache directory with entries entries, each with a response info in a
+    1K block and a body of bodySize bytes in an external f_XXXXXX file or, up to 4 KiB, a data_N file
+    '''
+    if not os.path.isdir(folder):
+        os.makedirs(folder)
+    blocks = _BlockFiles()
+    table = [0] * BLOCKFILE_DEFAULT_TABLE_LEN
+    for index in range(entries):
+        key = CacheKey(index).encode()
+        info = ResponseInfo(index)
+        entryAddr, entryData, entryOffset = blocks.allocate(2, 2)
+        rankAddr, rankData, rankOffset = blocks.allocate(1)
+        infoAddr, infoData, infoOffset = blocks.allocate(3)
+        rankData[rankOffset:rankOffset + 8] = struct.pack("<q", WEBKIT_NOW + 5000000 + index)
+        infoData[infoOffset:infoOffset + len(info)] = info
+        # A block file address spans at most four blocks, larger bodies are external
+        if index % 2 or bodySize > 4 * 1024:
+            bodyAddr = _cacheAddress(0, 0, index)
+            with open(os.path.join(folder, "f_%06x" % index), "wb") as body:
+                body.write(b"B" * bodySize)
+        else:
+            bodyAddr, bodyData, bodyOffset = blocks.allocate(3, max(1, -(-bodySize // 1024)))
+            bodyData[bodyOffset:bodyOffset + bodySize] = b"B" * bodySize
+        bucket = index % len(table)
+        record = struct.pack("<IIIiiiqiI4i4II", index, table[bucket], rankAddr, 0, 0, 0, WEBKIT_NOW + index,
+            len(key), 0, len(info), bodySize, 0, 0, infoAddr, bodyAddr, 0, 0, 0)
+        entryData[entryOffset:entryOffset + len(record)] = record
+        entryData[entryOffset + 96:entryOffset + 96 + len(key)] = key
+        table[bucket] = entryAddr
+
+    index = struct.pack("<II", BLOCKFILE_INDEX_MAGIC, 0x30000) + b"\x00" * 20 + struct.pack("<i", len(table))
+    index += b"\x00" * (BLOCKFILE_INDEX_HEADER_SIZE - len(index)) + struct.pack("<%dI" % len(table), *table)
+    with open(os.path.join(folder, "index"), "wb") as stored:
+        stored.write(index)
+    for number, data in blocks.files.items():
+        with open(os.path.join(folder, "data_%d" % number), "wb") as stored:
+            stored.write(bytes(data))
+    return folder
+
+
+def CreateSimpleCache(folder, entries, bodySize=512):
+    '''A Simple cache directory with entries <hash>_0 files and its index-dir/the-real-index'''
+    if not os.path.isdir(os.path.join(folder, "index-dir")):
+        os.makedirs(os.path.join(folder, "index-dir"))
+    with open(os.path.join(folder, "index"), "wb") as stored:
+        stored.write(struct.pack("<QII4x", SIMPLE_INITIAL_MAGIC, 5, 0))
+    hashes = []
+    for index in range(entries):
+        hashKey = 0x1234567800000000 + index
+        key = ("https://s.example/%d" % index).encode()
+        body = b"X" * bodySize
+        info = ResponseInfo(index)
+        data = struct.pack("<QIII4x", SIMPLE_INITIAL_MAGIC, 5, len(key), 0) + key + body
+        data += struct.pack("<QIII4x", SIMPLE_FINAL_MAGIC, 0, 0, len(body)) + info + b"S" * 32
+        data += struct.pack("<QIII4x", SIMPLE_FINAL_MAGIC, 2, 0, len(info))
+        with open(os.path.join(folder, "%016x_0" % hashKey), "wb") as stored:
+            stored.write(data)
+        hashes.append(hashKey)
+    index = struct.pack("<IIQIQQI", 0, 0, SIMPLE_INDEX_MAGIC, 9, len(hashes), 0, 0)
+    for hashKey in hashes:
+        index += struct.pack("<QqQ", hashKey, WEBKIT_NOW + 60000000, 1 << 8)
+    with open(os.path.join(folder, "index-dir", "the-real-index"), "wb") as stored:
+        stored.write(index)
+    return folder
+
+
+# Stand-ins for the Autopsy objects, with the methods the parser calls
+
+class FakeFile(object):
+    '''AbstractFile of an image, optionally backed by a local file for its content'''
+    _ids = [100]
+
+    def __init__(self, parentPath, name, size=0, local=None, isDir=False, dataSourceId=1, mtime=0, crtime=0):
+        FakeFile._ids[0] += 1
+        self.id = FakeFile._ids[0]
+        self.parentPath = parentPath
+        self.name = name
+        self.local = local
+        self.size = os.path.getsize(local) if local else size
+        self.dir = isDir
+        self.dataSourceId = dataSourceId
+        self.mtime = mtime
+        self.crtime = crtime
+
+    def getId(self):
+        return self.id
+
+    def getName(self):
+        return self.name
+
+    def getParentPath(self):
+        return self.parentPath
+
+    def getUniquePath(self):
+        return "/img_test.E01/vol_vol2" + self.parentPath + self.name
+
+    def getSize(self):
+        return self.size
+
+    def getMtime(self):
+        return self.mtime
+
+    def getCrtime(self):
+        return self.crtime
+
+    def getMd5Hash(self):
+        return None
+
+    def getDataSourceObjectId(self):
+        return self.dataSourceId
+
+    def isDir(self):
+        return self.dir
+
+
+class FakeFileManager(object):
+    '''FileManager.findFiles over a list of files, counting the queries'''
+
+    def __init__(self, files):
+        self.files = files
+        self.queries = 0
+
+    def findFiles(self, dataSource, fileName, parentSubString):
+        self.queries += 1
+        # LIKE on the name and a case insensitive substring of the parent path, as on SQLite cases
+        return [file for file in self.files
+            if (fileName == "%" or file.getName().lower() == fileName.lower())
+                and parentSubString.lower() in file.getParentPath().lower()]
+
+
+def ProfileTree(users, profiles, browsers=("Google/Chrome", "Microsoft/Edge"), files=("History", "Top Sites", "Cookies")):
+    '''Files of a synthetic image with every user having profiles profiles in every browser'''
+    tree = []
+    for user in range(users):
+        for browser in browsers:
+            for profile in range(profiles):
+                name = "Default" if profile == 0 else "Profile %d" % profile
+                parent = "/Users/user%d/AppData/Local/%s/User Data/%s/" % (user, browser, name)
+                for fileName in files:
+                    tree.append(FakeFile(parent, fileName, 1024))
+                tree.append(FakeFile(parent, "Extensions", isDir=True))
+            tree.append(FakeFile("/Users/user%d/AppData/Local/%s/User Data/" % (user, browser), "Local State", 10))
+        tree.append(FakeFile("/Users/user%d/Documents/" % user, "notes.txt", 10))
+    return tree
+
+
+class FakeTransaction(object):
+    def __init__(self, case):
+        self.case = case
+        self.open = True
+
+    def commit(self):
+        self.case.roundTrips += 1
+        self.case.commits += 1
+        self.open = False
+
+    def rollback(self):
+        self.case.roundTrips += 1
+        self.open = False
+
+
+class FakeArtifact(object):
+    def __init__(self, artType, objId, attributes):
+        self.artType = artType
+        self.objId = objId
+        self.attributes = list(attributes)
+
+
+class FakeBlackboard(object):
+    '''Blackboard counting its writes, each call outside of a transaction is a round trip'''
+
+    def __init__(self, case, keep):
+        self.case = case
+        self.keep = keep
+        self.artifacts = []
+        self.created = 0
+        self.posts = 0
+
+    def newDataArtifact(self, artType, objId, dataSourceObjId, attributes, osAccountId, trans):
+        if trans is None or not trans.open:
+            self.case.roundTrips += 1
+        self.created += 1
+        artifact = FakeArtifact(artType, objId, attributes)
+        if self.keep:
+            self.artifacts.append(artifact)
+        return artifact
+
+    def postArtifacts(self, artifacts, moduleName):
+        self.case.roundTrips += 1
+        self.posts += 1
+
+
+class FakeCase(object):
+    '''SleuthkitCase with a counting blackboard, keep=False only counts the artifacts'''
+
+    def __init__(self, keep=True):
+        self.roundTrips = 0
+        self.commits = 0
+        self.transactions = 0
+        self.blackboard = FakeBlackboard(self, keep)
+
+    def beginTransaction(self):
+        self.roundTrips += 1
+        self.transactions += 1
+        return FakeTransaction(self)
+
+    def getBlackboard(self):
+        return self.blackboard
+
+
+class FakeProgressBar(object):
+    def __init__(self):
+        self.total = None
+        self.values = []
+
+    def switchToDeterminate(self, total):
+        self.total = total
+
+    def progress(self, *args):
+        self.values.append(args[-1])
@@ -0,0 +1,89 @@
+import unittest
+
+from fixtures import FakeCase, FakeFile
+from Windows_Chrome_Pipeline import ArtifactBatchWriter, PhaseTimer
+
+
+class ArtifactBatchWriterTest(unittest.TestCase):
+    def write(self, rows, chunkSize):
+        case = FakeCase()
+        content = FakeFile("/Users/bob/", "History", 10)
+        timer = PhaseTimer()
+        writer = ArtifactBatchWriter(case, "Chrome", chunkSize, timer)
+        writer.begin("bob/Google/Chrome/Default", "urls")
+        for index in range(rows):
+            writer.add(content, "TSK_WEB_HISTORY", ["attribute %d" % index])
+        writer.flush()
+        return case, writer, timer
+
+    def test_one_transaction_and_post_per_chunk(self):
+        case, writer, timer = self.write(1234, 500)
+        # begin, commit and post per chunk, the artifacts are created inside the transaction
+        self.assertEqual(case.transactions, 3)
+        self.assertEqual(case.commits, 3)
+        self.assertEqual(case.blackboard.posts, 3)
+        self.assertEqual(case.roundTrips, 3 * 3)
+        self.assertEqual(writer.chunkCount, 3)
+        self.assertEqual(writer.artifactCount, 1234)
+
+    def test_artifacts_keep_their_attributes_in_order(self):
+        case, writer, timer = self.write(10, 4)
+        self.assertEqual([artifact.attributes for artifact in case.blackboard.artifacts],
+            [["attribute %d" % index] for index in range(10)])
+
+    def test_nothing_written_without_rows(self):
+        case, writer, timer = self.write(0, 500)
+        self.assertEqual(case.roundTrips, 0)
+
+    def test_failed_chunk_is_rolled_back(self):
+        case = FakeCase()
+
+        def broken(*args):
+            raise RuntimeError("constraint")
+        case.blackboard.newDataArtifact = broken
+        writer = ArtifactBatchWriter(case, "Chrome", 10)
+        writer.add(FakeFile("/Users/bob/", "History"), "TSK_WEB_HISTORY", [])
+        self.assertRaises(RuntimeError, writer.flush)
+        self.assertEqual(case.commits, 0)
+        self.assertEqual(case.blackboard.posts, 0)
+
+    def test_callbacks_run_once_their_rows_are_committed(self):
+        case = FakeCase()
+        writer = ArtifactBatchWriter(case, "Chrome", 3)
+        content = FakeFile("/Users/bob/", "History")
+        called = []
+        writer.add(content, "TSK_WEB_HISTORY", [])
+        writer.after(lambda: called.append(case.commits))
+        self.assertEqual(called, [])
+        writer.add(content, "TSK_WEB_HISTORY", [])
+        writer.add(content, "TSK_WEB_HISTORY", [])
+        self.assertEqual(called, [1])
+        # Nothing is queued, the callback runs at once
+        writer.after(lambda: called.append(case.commits))
+        self.assertEqual(called, [1, 1])
+
+    def test_callbacks_of_a_failed_chunk_never_run(self):
+        case = FakeCase()
+
+        def broken(*args):
+            raise RuntimeError("constraint")
+        case.blackboard.newDataArtifact = broken
+        writer = ArtifactBatchWriter(case, "Chrome", 10)
+        called = []
+        writer.add(FakeFile("/Users/bob/", "History"), "TSK_WEB_HISTORY", [])
+        writer.after(lambda: called.append(1))
+        self.assertRaises(RuntimeError, writer.flush)
+        self.assertTrue(writer.failed)
+        writer.after(lambda: called.append(2))
+        writer.flush()
+        self.assertEqual(called, [])
+
+    def test_phases_are_timed(self):
+        case, writer, timer = self.write(600, 500)
+        lines = timer.summary()
+        self.assertTrue(lines[0].startswith("artifacts bob/Google/Chrome/Default [urls]: 600 rows"))
+        self.assertTrue(lines[1].startswith("events bob/Google/Chrome/Default [urls]: 2 events"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import io
+import multiprocessing
+import os
+import shutil
+import tempfile
+import unittest
+
+from fixtures import CreateHistory, CreateTopSites
+import Windows_Chrome_Batch
+from Windows_Chrome_Batch import Run
+
+
+class ListWriter(object):
+    def __init__(self):
+        self.rows = []
+
+    def write(self, task, rows):
+        self.rows.extend(rows)
+
+
+def DyingTaskRows(task, stats):
+    # Kills the worker parsing Top Sites, as a crash or the OOM killer would
+    if task.path.endswith("Top Sites"):
+        os._exit(1)
+    return ParentTaskRows(task, stats)
+
+
+ParentTaskRows = Windows_Chrome_Batch.TaskRows
+
+
+class BatchRunTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        profile = os.path.join(self.folder, "bob", "User Data", "Default")
+        os.makedirs(profile)
+        CreateHistory(os.path.join(profile, "History"), 100, 2, downloads=3)
+        CreateTopSites(os.path.join(profile, "Top Sites"), 10)
+
+    def tearDown(self):
+        Windows_Chrome_Batch.TaskRows = ParentTaskRows
+        shutil.rmtree(self.folder)
+
+    def test_all_rows_are_written(self):
+        writer = ListWriter()
+        log = io.StringIO()
+        totals = Run([self.folder], writer, 2, {"recover": True, "temp": None}, log)
+        self.assertEqual(totals["errors"], 0, log.getvalue())
+        self.assertEqual(totals["files"], 2)
+        tables = [table for table, values in writer.rows]
+        self.assertEqual(tables.count("urls"), 100)
+        self.assertEqual(tables.count("visits"), 200)
+        self.assertEqual(tables.count("top_sites"), 10)
+
+    @unittest.skipUnless(multiprocessing.get_start_method() == "fork", "the dying worker is patched in before the fork")
+    def test_dead_worker_does_not_hang(self):
+        Windows_Chrome_Batch.TaskRows = DyingTaskRows
+        writer = ListWriter()
+        log = io.StringIO()
+        totals = Run([self.folder], writer, 2, {"recover": True, "temp": None}, log)
+        self.assertEqual(totals["errors"], 1)
+        self.assertIn("Top Sites: worker process", log.getvalue())
+        self.assertEqual([table for table, values in writer.rows].count("urls"), 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
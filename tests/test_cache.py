@@ -0,0 +1,77 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from fixtures import CreateBlockfileCache, CreateSimpleCache, WEBKIT_NOW
+from Windows_Chrome_Core import CACHE, ReadCache, WEBKIT_EPOCH_OFFSET
+from Windows_Chrome_Cache import OpenCache, LocalCacheFolder
+
+
+# Cache folder counting the bytes read from its files, like the module's image folder
+class CountingFolder(LocalCacheFolder):
+    def __init__(self, path):
+        LocalCacheFolder.__init__(self, path)
+        self.bytesRead = 0
+
+    def open(self, name):
+        data = LocalCacheFolder.open(self, name)
+        if data is not None:
+            read = data.read
+
+            def counted(offset, length):
+                chunk = read(offset, length)
+                self.bytesRead += len(chunk)
+                return chunk
+            data.read = counted
+        return data
+
+
+def FolderSize(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, dirs, files in os.walk(path) for name in files)
+
+
+class CacheTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_blockfile_entries(self):
+        folder = CreateBlockfileCache(os.path.join(self.folder, "Cache_Data"), 300, 700)
+        records = sorted(ReadCache(folder, CACHE))
+        self.assertEqual(len(records), 300)
+        self.assertEqual(records[0].url, "https://a.example/asset/0.js")
+        self.assertEqual(records[0].size, 700)
+        self.assertEqual(records[0].created, WEBKIT_NOW // 1000000 - WEBKIT_EPOCH_OFFSET)
+        self.assertIn("X-Index: 0", records[0].headers)
+
+    def test_blockfile_bodies(self):
+        folder = CreateBlockfileCache(os.path.join(self.folder, "Cache_Data"), 4, 700)
+        cache = OpenCache(folder)
+        try:
+            self.assertEqual([cache.body(entry) for entry in cache.entries()], [b"B" * 700] * 4)
+        finally:
+            cache.close()
+
+    def test_simple_entries(self):
+        folder = CreateSimpleCache(os.path.join(self.folder, "Cache_Data"), 25, 300)
+        records = list(ReadCache(folder, CACHE))
+        self.assertEqual(len(records), 25)
+        self.assertEqual(records[0].url, "https://s.example/0")
+        self.assertEqual(records[0].size, 300)
+        self.assertEqual(records[0].last_used, WEBKIT_NOW // 1000000 - WEBKIT_EPOCH_OFFSET + 60)
+        self.assertIn("X-Index: 0", records[0].headers)
+
+
+    def test_bodies_are_not_read(self):
+        for create in (CreateBlockfileCache, CreateSimpleCache):
+            path = create(os.path.join(self.folder, create.__name__), 200, 64 * 1024)
+            folder = CountingFolder(path)
+            self.assertEqual(len(list(ReadCache(folder, CACHE))), 200)
+            self.assertLess(folder.bytesRead, FolderSize(path) // 20)
+
+
+if __name__ == "__main__":
+    unittest.main()
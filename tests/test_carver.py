@@ -0,0 +1,87 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from fixtures import CreateHistory
+from Windows_Chrome_Carver import Carver, CarveDatabase
+
+
+class CarverTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.folder = tempfile.mkdtemp()
+        cls.path = CreateHistory(os.path.join(cls.folder, "History"), 5000, 1)
+        db = sqlite3.connect(cls.path)
+        db.execute("PRAGMA secure_delete=OFF")
+        db.execute("DELETE FROM urls WHERE id % 2 = 0")
+        db.commit()
+        db.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.folder)
+
+    def test_deleted_rows_are_recovered(self):
+        urls = [row for table, rowid, row in CarveDatabase(self.path, ["urls"]) if table == "urls"]
+        self.assertGreater(len(urls), 1000)
+
+    def test_cancel_stops_the_carve(self):
+        calls = [0]
+
+        def isCancelled():
+            calls[0] += 1
+            return True
+        self.assertEqual(CarveDatabase(self.path, ["urls"], isCancelled), [])
+        self.assertEqual(calls[0], 1)
+
+    def test_cancel_is_checked_every_few_regions(self):
+        calls = [0]
+
+        def isCancelled():
+            calls[0] += 1
+            return False
+        CarveDatabase(self.path, ["urls"], isCancelled)
+        self.assertGreater(calls[0], 1)
+
+
+class WipedSpaceTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.folder = tempfile.mkdtemp()
+        cls.path = CreateHistory(os.path.join(cls.folder, "History"), 5000, 1)
+        db = sqlite3.connect(cls.path)
+        db.execute("PRAGMA secure_delete=ON")
+        db.execute("DELETE FROM urls WHERE id % 2 = 0")
+        db.execute("DELETE FROM visits WHERE id % 2 = 0")
+        db.commit()
+        db.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.folder)
+
+    def test_zeroed_space_is_not_carved(self):
+        self.assertEqual(CarveDatabase(self.path, ["urls", "visits"]), [])
+
+    def test_no_empty_records_are_decoded(self):
+        carver = Carver(self.path, ["urls", "visits"])
+        decoded = [0]
+        record, headlessRecord = carver.record, carver.headlessRecord
+
+        def counted(method):
+            def call(*args):
+                decoded[0] += 1
+                return method(*args)
+            return call
+        carver.record, carver.headlessRecord = counted(record), counted(headlessRecord)
+        try:
+            self.assertEqual(list(carver.records()), [])
+        finally:
+            carver.close()
+        self.assertEqual(decoded[0], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import Windows_Chrome_Core
+from fixtures import CreateHistory, CreateTopSites, WEBKIT_NOW
+from Windows_Chrome_Core import URLS, VISITS, DOWNLOADS, TOP_SITES, WEBKIT_EPOCH_OFFSET, HOST_CACHE_SIZE
+from Windows_Chrome_Core import ReadTable, EstimateRows, SqliteSource, UrlParts
+from Windows_Chrome_Core import SplitTargetPath, ProfileDrive
+
+
+class CoreReadersTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.history = SqliteSource(CreateHistory(os.path.join(self.folder, "History"), 50, 2, downloads=3))
+        self.topSites = SqliteSource(CreateTopSites(os.path.join(self.folder, "Top Sites"), 20))
+
+    def tearDown(self):
+        self.history.close()
+        self.topSites.close()
+        shutil.rmtree(self.folder)
+
+    def test_urls_are_enriched_and_converted(self):
+        records = list(ReadTable(self.history, URLS))
+        self.assertEqual(len(records), 50)
+        first = records[0]
+        self.assertEqual(first.id, 1)
+        self.assertEqual(first.last_visit_time, WEBKIT_NOW // 1000000 - WEBKIT_EPOCH_OFFSET + 1)
+        self.assertEqual(first.host, "www.site1.example")
+        self.assertEqual(first.domain, "site1.example")
+        self.assertEqual(first.search_terms, "")
+        search = records[9]
+        self.assertEqual(search.host, "www.google.com")
+        self.assertEqual(search.search_terms, "term 10")
+
+    def test_watermark_skips_rows(self):
+        self.assertEqual([record.id for record in ReadTable(self.history, URLS, 45)], [46, 47, 48, 49, 50])
+        self.assertEqual(EstimateRows(self.history, URLS, 45), 5)
+
+    def test_visits_join_referrer(self):
+        records = list(ReadTable(self.history, VISITS))
+        self.assertEqual(len(records), 100)
+        self.assertEqual(records[0].from_url, None)
+        self.assertEqual(records[1].from_url, records[0].url)
+        self.assertEqual(records[0].transition, "TYPED")
+
+    def test_downloads_and_top_sites(self):
+        self.assertEqual([record.target_path for record in ReadTable(self.history, DOWNLOADS)][0],
+            "C:\\Users\\Bob\\Downloads\\file1.exe")
+        sites = list(ReadTable(self.topSites, TOP_SITES))
+        self.assertEqual(len(sites), 20)
+        self.assertEqual(sites[0].url_rank, 0)
+
+
+class UrlPartsTest(unittest.TestCase):
+    def test_parts(self):
+        for url, parts in (
+                ("https://www.google.co.uk/search?q=caf%C3%A9+menu&oq=x", ("www.google.co.uk", "google.co.uk", u"caf\xe9 menu")),
+                ("https://duckduckgo.com?q=a/b", ("duckduckgo.com", "duckduckgo.com", "a/b")),
+                ("https://user:pw@Sub.Example.COM:8080/a?b=c", ("sub.example.com", "example.com", "")),
+                ("chrome://settings/", ("settings", "settings", "")),
+                ("chrome://history/", ("history", "history", "")),
+                ("abcdefg://host/", ("host", "host", "")),
+                ("http://a", ("a", "a", "")),
+                ("file:///C:/x.html", ("", "", "")),
+                ("about:blank", ("", "", "")),
+                (None, ("", "", ""))):
+            # The second call is answered from the cache
+            self.assertEqual(UrlParts(url), parts, url)
+            self.assertEqual(UrlParts(url), parts, url)
+
+    def test_short_scheme_does_not_hit_a_longer_key(self):
+        self.assertEqual(UrlParts("abcdefg:/x/"), ("", "", ""))
+        self.assertEqual(UrlParts("abcdefg://host/x"), ("host", "host", ""))
+
+    def test_host_cache_evicts_the_oldest_host_only(self):
+        for index in range(HOST_CACHE_SIZE + 10):
+            UrlParts("https://h%d.example.com/" % index)
+        self.assertEqual(len(Windows_Chrome_Core._urlHosts), HOST_CACHE_SIZE)
+        self.assertNotIn("https://h9.example.com", Windows_Chrome_Core._urlHosts)
+        self.assertIn("https://h10.example.com", Windows_Chrome_Core._urlHosts)
+
+
+class TargetPathTest(unittest.TestCase):
+    PROFILE = "/Users/Bob/AppData/Local/Google/Chrome/User Data/Default/"
+
+    def test_split_keeps_the_drive(self):
+        self.assertEqual(SplitTargetPath("c:\\Users\\Bob\\Downloads\\setup.exe"), ("C:", "/Users/Bob/Downloads/", "setup.exe"))
+        self.assertEqual(SplitTargetPath("\\\\?\\D:\\setup.exe"), ("D:", "/", "setup.exe"))
+        for path in ("", None, "setup.exe", "\\\\server\\share\\setup.exe", "C:\\Downloads\\"):
+            self.assertEqual(SplitTargetPath(path), None, path)
+
+    def test_profile_drive_from_downloads_in_its_home(self):
+        locations = [SplitTargetPath(path) for path in ("E:\\Media\\a.mp4", "C:\\Users\\bob\\Downloads\\b.exe", None)]
+        self.assertEqual(ProfileDrive(self.PROFILE, locations), "C:")
+
+    def test_profile_drive_unknown(self):
+        self.assertEqual(ProfileDrive(self.PROFILE, [SplitTargetPath("E:\\Media\\a.mp4")]), None)
+        locations = [SplitTargetPath(path) for path in ("C:\\Users\\Bob\\a.exe", "D:\\Users\\Bob\\b.exe")]
+        self.assertEqual(ProfileDrive(self.PROFILE, locations), None)
+        self.assertEqual(ProfileDrive("/Chrome/User Data/Default/", locations[:1]), None)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import io
+import unittest
+
+from Windows_Chrome_Core import JsonEvents, ParseBookmarks, ParsePreferences, JSON_CHUNK
+
+
+def Values(text, chunkSize):
+    return [value for path, event, value in JsonEvents(io.StringIO(text), chunkSize) if event == "value"]
+
+
+class JsonEventsTest(unittest.TestCase):
+    def test_number_cut_at_the_chunk_boundary(self):
+        head = u'{"padding": "'
+        tail = u'", "sync": {"interval": 12.75}}'
+        # The chunk ends between "12." and "75"
+        padding = JSON_CHUNK - len(head) - len(u'", "sync": {"interval": 12.')
+        text = head + u"x" * padding + tail
+        self.assertEqual(text[JSON_CHUNK - 3:JSON_CHUNK + 2], u"12.75")
+        self.assertEqual(list(ParsePreferences(io.StringIO(text))), [(0, u"sync.interval", 12.75)])
+
+    def test_every_split_of_numbers_and_literals(self):
+        text = u'{"a": [12.75, 1e5, -3E+2, 40, true, false, null, "x"], "b": 7}'
+        for chunkSize in range(1, len(text) + 1):
+            self.assertEqual(Values(text, chunkSize), [12.75, 100000.0, -300.0, 40, True, False, None, u"x", 7])
+
+    def test_invalid_number(self):
+        self.assertRaises(ValueError, Values, u"[12x]", 2)
+
+
+class BookmarksTest(unittest.TestCase):
+    # Keys sorted like Chrome writes them, the bar holds newer bookmarks than other
+    TEXT = u"""{"roots": {
+        "bookmark_bar": {"children": [
+            {"children": [{"id": "9", "name": "c", "type": "url", "url": "https://c/"}], "id": "8", "name": "news", "type": "folder"},
+            {"id": "7", "name": "b", "type": "url", "url": "https://b/"}], "id": "1", "name": "Bar", "type": "folder"},
+        "other": {"children": [
+            {"id": "3", "name": "a", "type": "url", "url": "https://a/"}], "id": "2", "name": "Other", "type": "folder"}}}"""
+
+    def test_nodes_come_in_id_order(self):
+        records = list(ParseBookmarks(io.StringIO(self.TEXT)))
+        self.assertEqual([(record[0], record.folder) for record in records], [(3, u"Other"), (7, u"Bar"), (9, u"Bar/news")])
+
+    def test_since(self):
+        self.assertEqual([record[0] for record in ParseBookmarks(io.StringIO(self.TEXT), 3)], [7, 9])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+
+from fixtures import FakeFile, FakeFileManager, ProfileTree
+from Windows_Chrome_Core import EXTRACTORS
+from Windows_Chrome_Pipeline import ProfileIndex
+
+
+class ProfileIndexTest(unittest.TestCase):
+    def build(self, users, profiles):
+        fileManager = FakeFileManager(ProfileTree(users, profiles))
+        index = ProfileIndex().build(fileManager, None)
+        for extractor in EXTRACTORS:
+            for path in extractor.paths:
+                index.findFiles(path)
+        return fileManager, index
+
+    def test_query_count_does_not_grow_with_the_tree(self):
+        small, smallIndex = self.build(1, 1)
+        large, largeIndex = self.build(20, 8)
+        self.assertEqual(small.queries, 1)
+        self.assertEqual(large.queries, 1)
+        self.assertEqual(len(largeIndex.profiles), 20 * 2 * 8)
+
+    def test_files_are_found_in_every_profile(self):
+        fileManager, index = self.build(3, 2)
+        found = index.findFiles("History")
+        self.assertEqual(len(found), 3 * 2 * 2)
+        labels = [profile.label for profile, file in found]
+        self.assertEqual(labels, sorted(labels, key=str.lower))
+        self.assertIn("user0/Google/Chrome/Profile 1", labels)
+        self.assertEqual(index.findFiles("Extensions"), [])
+
+    def test_siblings_stay_in_their_folder(self):
+        parent = "/Users/bob/AppData/Local/Google/Chrome/User Data/Default/"
+        files = [FakeFile(parent, "History"), FakeFile(parent + "Cache/Cache_Data/", "index"),
+            FakeFile(parent + "Cache/Cache_Data/", "data_0"), FakeFile(parent + "Cache/Cache_Data/", "f_000001"),
+            FakeFile(parent + "Cache/", "other")]
+        index = ProfileIndex().build(FakeFileManager(files), None)
+        profile, cacheIndex = index.findFiles("Cache/Cache_Data/index")[0]
+        self.assertEqual([path for path, file in profile.siblings("Cache/Cache_Data/index")],
+            ["Cache/Cache_Data/data_0", "Cache/Cache_Data/f_000001"])
+
+if __name__ == "__main__":
+    unittest.main()
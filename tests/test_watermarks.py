@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from fixtures import FakeFile
+from Windows_Chrome_Core import EXTRACTORS, UNMARKED_TABLES
+from Windows_Chrome_Pipeline import ChromeProfile, DatabaseUnit, WatermarkStore, WatermarkPath
+
+HISTORY = EXTRACTORS[0]
+
+
+class WatermarkStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, "module", "watermarks.json")
+        self.file = FakeFile("/Users/bob/", "History", 4096, mtime=100)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def unit(self):
+        return DatabaseUnit(ChromeProfile("bob", "Google/Chrome", "Default"), self.file, [], HISTORY)
+
+    def test_unchanged_database_is_skipped(self):
+        store = WatermarkStore(self.path)
+        unit = self.unit()
+        self.assertTrue(store.prepare(unit))
+        unit.marks["urls"] = 50
+        store.update(unit, True)
+        store.save()
+        self.assertFalse(WatermarkStore(self.path).prepare(self.unit()))
+
+    def test_changed_database_keeps_marks_and_completed_tables(self):
+        store = WatermarkStore(self.path)
+        unit = self.unit()
+        store.prepare(unit)
+        unit.marks["urls"] = 50
+        unit.completed.add("recovered_urls")
+        store.update(unit, True)
+        store.save()
+
+        self.file.mtime = 200
+        unit = self.unit()
+        self.assertTrue(WatermarkStore(self.path).prepare(unit))
+        self.assertEqual(unit.mark("urls"), 50)
+        self.assertEqual([reader.table for reader in unit.pending(unit.carvers)],
+            ["recovered_visits", "recovered_downloads"])
+        self.assertEqual([reader.table for reader in unit.pending(unit.readers)], ["urls", "visits", "downloads"])
+
+    def test_stored_marks_do_not_follow_the_unit(self):
+        store = WatermarkStore(self.path)
+        unit = self.unit()
+        store.prepare(unit)
+        unit.marks["urls"] = 50
+        store.update(unit, False)
+        unit.marks["urls"] = 90
+        store.save()
+        self.file.mtime = 200
+        unit = self.unit()
+        WatermarkStore(self.path).prepare(unit)
+        self.assertEqual(unit.mark("urls"), 50)
+
+    def test_data_sources_keep_their_own_file(self):
+        folder = os.path.join(self.folder, "module")
+        first, second = WatermarkStore(WatermarkPath(folder, 1)), WatermarkStore(WatermarkPath(folder, 2))
+        unit = self.unit()
+        first.prepare(unit)
+        first.update(unit, True)
+        other = DatabaseUnit(ChromeProfile("eve", "Google/Chrome", "Default"), FakeFile("/Users/eve/", "History", 10), [], HISTORY)
+        second.prepare(other)
+        second.update(other, True)
+        # Both jobs loaded their file before either one saved
+        first.save()
+        second.save()
+        self.assertFalse(WatermarkStore(WatermarkPath(folder, 1)).prepare(self.unit()))
+        self.assertTrue(WatermarkStore(WatermarkPath(folder, 1)).prepare(other))
+        self.assertFalse(WatermarkStore(WatermarkPath(folder, 2)).prepare(other))
+
+    def test_tables_without_row_ids(self):
+        for extractor in EXTRACTORS:
+            for reader in extractor.carvers:
+                self.assertIn(reader.table, UNMARKED_TABLES)
+        self.assertIn("preferences", UNMARKED_TABLES)
+        self.assertIn("cache", UNMARKED_TABLES)
+        self.assertNotIn("urls", UNMARKED_TABLES)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,169 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from fixtures import CreateHistory, CreateTopSites, FakeCase, FakeFile
+from Windows_Chrome_Core import EXTRACTORS, ReadTable, AttributeValues, SqliteSource
+from Windows_Chrome_Pipeline import ChromeProfile, DatabaseUnit, ExtractionPipeline, ParseWorkerPool, ArtifactBatchWriter
+try:
+    import Queue
+except ImportError:
+    import queue as Queue
+
+HISTORY = EXTRACTORS[0]
+TOP_SITES = EXTRACTORS[1]
+
+
+# Copies each database to a temp file like TempExtractor and tracks the copies still on disk
+class CopyingExtractor(object):
+    def __init__(self, folder):
+        self.folder = folder
+        self.live = set()
+        self.lock = threading.Lock()
+
+    def extract(self, unit):
+        path = os.path.join(self.folder, "copy_%d" % unit.file.getId())
+        shutil.copyfile(unit.file.local, path)
+        with self.lock:
+            self.live.add(path)
+        return path
+
+    def remove(self, path):
+        os.remove(path)
+        with self.lock:
+            self.live.remove(path)
+
+
+def ParseDatabase(unit, path, emit):
+    source = SqliteSource(path)
+    try:
+        for reader in unit.readers:
+            for record in ReadTable(source, reader):
+                emit(reader.table, record[0], reader.artifact, AttributeValues(reader, record))
+    finally:
+        source.close()
+
+
+class ParseWorkerPoolTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.folder = tempfile.mkdtemp()
+        cls.files = []
+        for index in range(16):
+            path = os.path.join(cls.folder, "History_%d" % index)
+            if index % 5 == 3:
+                # Not a database, its parser fails
+                with open(path, "wb") as broken:
+                    broken.write(b"not a database" * 100)
+            else:
+                CreateHistory(path, 50 + index * 37, 2, downloads=index)
+            cls.files.append(FakeFile("/Users/user%d/" % index, "History", local=path))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.folder)
+
+    def run_pool(self, threads, chunkSize=64):
+        copies = tempfile.mkdtemp(dir=self.folder)
+        extractor = CopyingExtractor(copies)
+        units = [DatabaseUnit(ChromeProfile("user%d" % index, "Google/Chrome", "Default"), file, [], HISTORY)
+            for index, file in enumerate(self.files)]
+        case = FakeCase()
+        writer = ArtifactBatchWriter(case, "Chrome", 100)
+        events = []
+
+        def write(unit, rows):
+            for table, rowId, artType, attributes in rows:
+                writer.add(unit.file, artType, attributes)
+
+        def fail(unit, error):
+            events.append(("fail", unit.profile.label))
+
+        def finish(unit):
+            writer.flush()
+            events.append(("finish", unit.profile.label))
+
+        pipeline = ExtractionPipeline(extractor, units, lambda: False)
+        ParseWorkerPool(threads, chunkSize, lambda: False).run(pipeline, ParseDatabase, write, fail, finish)
+        self.assertEqual(extractor.live, set())
+        return [(artifact.objId, artifact.artType, artifact.attributes) for artifact in case.blackboard.artifacts], events
+
+    def test_output_does_not_depend_on_the_thread_count(self):
+        artifacts, events = self.run_pool(1)
+        self.assertEqual(len([event for event in events if event[0] == "fail"]), 3)
+        self.assertEqual([event[1] for event in events if event[0] == "finish"],
+            ["user%d/Google/Chrome/Default" % index for index in range(16)])
+        for threads in (4, 16):
+            for attempt in range(3):
+                self.assertEqual(self.run_pool(threads, 7 + attempt * 50), (artifacts, events))
+
+    def test_cancel_stops_the_pool(self):
+        cancelled = [False]
+        extractor = CopyingExtractor(tempfile.mkdtemp(dir=self.folder))
+        units = [DatabaseUnit(ChromeProfile("user%d" % index, "Google/Chrome", "Default"), file, [], HISTORY)
+            for index, file in enumerate(self.files)]
+        written = []
+
+        def write(unit, rows):
+            written.extend(rows)
+            cancelled[0] = True
+
+        pipeline = ExtractionPipeline(extractor, units, lambda: cancelled[0])
+        ParseWorkerPool(4, 10, lambda: cancelled[0]).run(pipeline, ParseDatabase, write,
+            lambda unit, error: None, lambda unit: None)
+        self.assertEqual(len(written), 10)
+        self.assertEqual(extractor.live, set())
+
+
+class CancelLatencyTest(unittest.TestCase):
+    ROWS = 1000000
+
+    @classmethod
+    def setUpClass(cls):
+        cls.folder = tempfile.mkdtemp()
+        cls.file = FakeFile("/Users/bob/", "Top Sites", local=CreateTopSites(os.path.join(cls.folder, "Top Sites"), cls.ROWS))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.folder)
+
+    def test_cancel_returns_within_a_second(self):
+        cancelled = threading.Event()
+        cancelledAt = []
+        written = [0]
+
+        def cancel():
+            cancelledAt.append(time.time())
+            cancelled.set()
+
+        def write(unit, rows):
+            written[0] += len(rows)
+
+        unit = DatabaseUnit(ChromeProfile("bob", "Google/Chrome", "Default"), self.file, [], TOP_SITES)
+        pipeline = ExtractionPipeline(CopyingExtractor(tempfile.mkdtemp(dir=self.folder)), [unit], cancelled.is_set)
+        timer = threading.Timer(0.3, cancel)
+        timer.start()
+        try:
+            ParseWorkerPool(4, 500, cancelled.is_set).run(pipeline, ParseDatabase, write,
+                lambda unit, error: None, lambda unit: None)
+            stopped = time.time()
+        finally:
+            timer.cancel()
+        self.assertTrue(cancelled.is_set())
+        self.assertLess(written[0], self.ROWS)
+        self.assertLess(stopped - cancelledAt[0], 1.0)
+
+    def test_get_gives_up_when_cancelled(self):
+        cancelled = [False]
+        pool = ParseWorkerPool(1, 10, lambda: cancelled[0])
+        threading.Timer(0.1, lambda: cancelled.__setitem__(0, True)).start()
+        started = time.time()
+        self.assertEqual(pool.get(Queue.Queue()), None)
+        self.assertLess(time.time() - started, 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()